@@ -6,31 +6,74 @@
 Pre-code tutorial on concordance
 """
 # Import libraries
+from html import escape
 from pathlib import Path
 
+import concordance_api as api
 import streamlit as st
-import nltk
-import pandas as pd
-import plotly.graph_objs as go
-nltk.download('punkt') 
+from corpus_index import parse_query
+from corpus_registry import registry
+from corpus_store import store
+from kwic_export import FORMATS
+from profiling import ENABLED as PROFILE_ALL_RUNS
+from profiling import count, span, trace
+
+# pandas and plotly are imported where they are first used to keep startup fast
 
 # Define constants
-MAX_LINES = 2**63 - 1
+PAGE_SIZES = [25, 50, 100, 250]
+SORT_LABELS = {
+    "Order in the text": None,
+    "Key word": "node",
+    "1st word to the left": "L1",
+    "2nd word to the left": "L2",
+    "3rd word to the left": "L3",
+    "1st word to the right": "R1",
+    "2nd word to the right": "R2",
+    "3rd word to the right": "R3",
+}
+KWIC_STYLE = "font-family:courier;text-align:center;white-space:pre"
+MEASURE_LABELS = {
+    "Frequency": "frequency",
+    "Mutual information (MI)": "mi",
+    "t-score": "t-score",
+    "Log-likelihood": "log-likelihood",
+}
 
 
 @st.cache_data
 def read_file(fname):
     """read in the data of a file"""
+    count("cache_data.misses")
     path = Path(__file__).parent / "data" / fname
     with open(path, "r") as f:
         content = f.read()
     return content
 
 
-othello_data = read_file("othello.txt")
-lear_data = read_file("king_lear.txt")
-tame_data = read_file("taming_of_the_shrew.txt")
-merchant_data = read_file("merchant_of_venice.txt")
+def call_cached(func, *args):
+    """call a st.cache_data function in a profiling span, so its hashing and unpickling
+    time shows up; the function counts a miss whenever its body runs"""
+    count("cache_data.calls")
+    with span(func.__name__):
+        return func(*args)
+
+
+def work_labels(corpus_ids):
+    """the titles of some works for charts and tables, adding the file name to a title several works share"""
+    titles = [api.title(cid) for cid in corpus_ids]
+    return [
+        f"{title} ({cid})" if titles.count(title) > 1 else title
+        for title, cid in zip(titles, corpus_ids)
+    ]
+
+
+def list_works():
+    """return the titles of the registered works as an italicized list for the page text"""
+    titles = [f"*{title}*" for title in registry.titles]
+    if len(titles) <= 2:
+        return " and ".join(titles)
+    return ", ".join(titles[:-1]) + ", and " + titles[-1]
 
 
 # define a function to load images
@@ -47,145 +90,315 @@ def display_image(image, caption=None):
 def try_another_word():
     st.markdown("""#### Try a different word/phrase""")
     st.markdown(
-        "Enter a keyword of your interest to generate a KWIC index for *Othello*, *King Lear*, *Taming of the Shrew*, and *The Merchant of Venice*."
+        f"Enter a keyword of your interest to generate a KWIC index for {list_works()}."
     )
     st.markdown(
         """
-    *Note: We have decided to lowercase all the letters for our analysis. The benefit to this approach is we can collect all examples of the key word, whether they occur at the beginning of a sentence or not. One downside is that
-     certain information could get mistaken, for example, if 'Black' referred to a person's name. A major benefit of learning to write your own code is the flexibility for making these kinds of research choices.*
+    *Note: By default we ignore the case of the letters when matching. The benefit to this approach is we can collect all examples of the key word, whether they occur at the beginning of a sentence or not. One downside is that
+     certain information could get mistaken, for example, if 'Black' referred to a person's name. Tick "Match case" to only find the key word written exactly as you typed it. Either way, the lines show the text with its original capitals and punctuation. A major benefit of learning to write your own code is the flexibility for making these kinds of research choices.*
     """
     )
     display_num_lines_message()
+    display_pattern_message()
     user_input = str(st.text_input("""Enter a keyword 👇"""))
-    if user_input:
+    match_case = st.checkbox("Match case", key="match_case")
+    if user_input and is_valid_query(user_input):
         # Compute word frequencies for each text
-        freq_othello = len(
-            get_concordance(
+        freqs = call_cached(get_frequencies, user_input, match_case)
+
+        # Display the KWIC indices
+        for info in registry:
+            display_freq(user_input, freqs[info.corpus_id], info.title)
+            display_kwic_pages(
                 user_input,
-                othello_data,
-                lines=MAX_LINES,
-                display=False,
+                info.corpus_id,
+                f"kwic_{info.corpus_id}",
+                case_sensitive=match_case,
             )
-        )
 
-        freq_lear = len(
-            get_concordance(user_input, lear_data, lines=MAX_LINES, display=False)
-        )
+        # section three: Expand the comparison
 
-        freq_tame = len(
-            get_concordance(user_input, tame_data, lines=MAX_LINES, display=False)
-        )
+        plot_comparison(user_input, match_case)
+        display_dispersion(user_input, match_case)
 
-        freq_merchant = len(
-            get_concordance(user_input, merchant_data, lines=MAX_LINES, display=False)
-        )
 
-        # Display the KWIC indices
-        display_freq(user_input, freq_othello, "Othello")
-        get_concordance(user_input, othello_data)
+def tokenize(data_string):
+    """index the file content string and return its corpus id, shared between
+    sessions pasting the same text; an edit of the text this session indexed last
+    only re-tokenizes the sentences that changed"""
+    progress_bar = None
+
+    def show_progress(fraction):
+        nonlocal progress_bar
+        if progress_bar is None:
+            progress_bar = st.progress(0.0, text="Tokenizing your text...")
+        progress_bar.progress(fraction)
+
+    corpus_id = api.index_text(
+        data_string, st.session_state.get("indexed_text"), show_progress
+    )["corpus"]
+    if progress_bar is not None:
+        progress_bar.empty()
+    st.session_state["indexed_text"] = corpus_id
+    return corpus_id
+
+
+def get_concordance(input_string, corpus_id, lines=25, width=100, display=True):
+    """take an input string and a corpus id and write out the concordance of the input string
+    in the corpus or return the concordance"""
+    concordance = api.concordance(
+        corpus_id, input_string, page_size=lines, width=width
+    )["lines"]
+    if display:
+        render_kwic(concordance)
+    else:
+        return concordance
 
-        display_freq(user_input, freq_lear, "King Lear")
-        get_concordance(user_input, lear_data)
 
-        display_freq(user_input, freq_tame, "Taming of the Shrew")
-        get_concordance(user_input, tame_data)
+def render_kwic(concordance, max_height=None):
+    """write concordance lines as a single HTML block, optionally in a scrolling box"""
+    rows = "".join(
+        f'<p style="{KWIC_STYLE}"><small>'
+        + escape(line["left"])
+        + "<strong>"
+        + escape(line["query"])
+        + "</strong>"
+        + escape(line["right"])
+        + "</small></p>"
+        for line in concordance
+    )
+    if max_height:
+        rows = f'<div style="max-height:{max_height}px;overflow-y:auto">{rows}</div>'
+    count("lines_rendered", len(concordance))
+    count("bytes_rendered", len(rows))
+    with span("render_kwic"):
+        st.markdown(rows, unsafe_allow_html=True)
+
+
+def display_kwic_pages(input_string, corpus_id, key, width=100, case_sensitive=False):
+    """page through every hit of an input string, fetching and rendering only the current page"""
+    (freq,) = api.frequencies(input_string, case_sensitive, [corpus_id])
+    total = freq["count"]
+    if not total:
+        return
+    col1, col2, col3 = st.columns(3)
+    sort = col1.selectbox("Sort lines by", list(SORT_LABELS), key=f"{key}_sort")
+    page_size = col3.selectbox("Lines per page", PAGE_SIZES, key=f"{key}_page_size")
+    num_pages = -(-total // page_size)
+    page = col2.number_input(
+        f"Page (of {num_pages})",
+        min_value=1,
+        max_value=num_pages,
+        value=1,
+        key=f"{key}_page_{input_string}_{page_size}_{case_sensitive}",
+    )
+    result = api.concordance(
+        corpus_id,
+        input_string,
+        page - 1,
+        page_size,
+        width,
+        SORT_LABELS[sort],
+        case_sensitive,
+    )
+    concordance, total = result["lines"], result["total"]
+    count("hits", total)
+    render_kwic(concordance, max_height=600)
+    first = (page - 1) * page_size + 1
+    st.caption(f"Lines {first}–{first + len(concordance) - 1} of {total}")
+
 
-        display_freq(user_input, freq_merchant, "Merchant of Venice")
-        get_concordance(user_input, merchant_data)
+@st.cache_data
+def get_frequencies(input_string, case_sensitive=False):
+    """count the hits of an input string in each loaded work without building concordance lines,
+    keyed by corpus id"""
+    count("cache_data.misses")
+    freqs = api.frequencies(input_string, case_sensitive)
+    return {freq["corpus"]: freq["count"] for freq in freqs}
 
-        # section three: Expand the comparison
 
-        plot_comparison(user_input)
+def parse_terms(input_string):
+    """split comma-separated keywords/phrases into lowercased terms, dropping blanks and repeats"""
+    terms = (" ".join(parse_query(term)) for term in input_string.split(","))
+    return tuple(dict.fromkeys(term for term in terms if term))
 
 
 @st.cache_data
-def tokenize(data_string):
-    """tokenize the file content string and return a nltk Text object"""
-    data_string = data_string.lower()
-    tokens = nltk.word_tokenize(data_string)
-    text_obj = nltk.Text(tokens)
-    return text_obj
+def get_frequency_matrix(terms):
+    """count every term in every loaded work in one batch and return a works x terms table"""
+    count("cache_data.misses")
+    import pandas as pd
+
+    matrix = api.frequency_matrix(terms)
+    return pd.DataFrame(
+        matrix["counts"], index=work_labels(matrix["corpora"]), columns=list(terms)
+    )
 
 
-@st.cache_data
-def get_concordance(input_string, data_string, lines=25, width=100, display=True):
-    """take an input string and a data string and write out the concordance of the input string
-    in data string or return the concordance"""
-    input_string = input_string.lower()
-    input_ls = input_string.split()
-    concordance = tokenize(data_string).concordance_list(input_ls, width, lines)
-    if display:
-        for i, line in enumerate(concordance):
-            st.markdown(
-                '<p style="font-family:courier;text-align:center;white-space:pre"><small>'
-                + line.left_print
-                + "&nbsp;"
-                + "<strong>"
-                + line.query
-                + "</strong>"
-                + "&nbsp;"
-                + line.right_print
-                + "</small></p>",
-                unsafe_allow_html=True,
-            )
-    else:
-        return concordance
+def is_valid_query(input_string):
+    """check the /regex/ words of a query, showing an error message if one is invalid"""
+    try:
+        api.parse(input_string)
+    except ValueError as err:
+        st.error(str(err))
+        return False
+    return True
 
 
 def display_freq(word, freq, text):
     ### display freq message
+    word = word.replace("*", "\\*")
     st.markdown(f"##### The word *{word}* appears {freq} times in *{text}*.")
 
 
 def display_num_lines_message():
-    st.markdown("""At most 25 concordances lines are displayed.""")
+    st.markdown(
+        """Concordance lines are shown one page at a time. Use the page number to jump through all the occurrences, and sort the lines by the words around the key word to bring similar contexts together."""
+    )
+
+
+def display_pattern_message():
+    st.markdown(
+        """Use `*` for any letters and `?` for a single letter to search for word forms: `jealous*` finds "jealous", "jealousy" and "jealousies". For full control, write a regular expression between slashes, e.g. `/deconstruct(ion|ions)/`."""
+    )
 
 
 @st.cache_data
-def plot_comparison(user_input="black"):
+def plot_comparison(user_input="black", case_sensitive=False):
     ### bar chart showing freq of 'black' in Othello, King Lear, Taming of the Shrew, Merchant of Venice
-    freq_othello = len(
-        get_concordance(
-            user_input, othello_data, lines=MAX_LINES, width=100, display=False
-        )
-    )
-    freq_lear = len(
-        get_concordance(
-            user_input, lear_data, lines=MAX_LINES, width=100, display=False
-        )
-    )
-    freq_tame = len(
-        get_concordance(
-            user_input, tame_data, lines=MAX_LINES, width=100, display=False
-        )
-    )
-    freq_merchant = len(
-        get_concordance(
-            user_input, merchant_data, lines=MAX_LINES, width=100, display=False
-        )
-    )
+    import pandas as pd
+    import plotly.graph_objs as go
+
+    freqs = call_cached(get_frequencies, user_input, case_sensitive)
     df = pd.DataFrame(
         {
-            "Canon": [
-                "Othello",
-                "King Lear",
-                "Taming of the Shrew",
-                "Merchant of Venice",
-            ],
-            "Freq": [freq_othello, freq_lear, freq_tame, freq_merchant],
+            "Canon": work_labels(list(freqs)),
+            "Freq": list(freqs.values()),
         }
     )
     trace = go.Bar(x=df["Canon"], y=df["Freq"])
+    layout = go.Layout(title=f"Frequency of '{user_input}' in {len(freqs)} works")
+    data = [trace]
+    fig = go.Figure(data=data, layout=layout)
+    st.plotly_chart(fig)
+
+
+@st.cache_data
+def get_dispersions(input_string, case_sensitive=False):
+    """find where the hits of an input string fall in each loaded work and how evenly they are spread"""
+    count("cache_data.misses")
+    return api.dispersions(input_string, case_sensitive=case_sensitive)
+
+
+def display_dispersion(user_input, case_sensitive=False):
+    st.markdown("""#### Where does it appear?""")
+    st.markdown(
+        """Each mark below is one occurrence, placed by how far into the text it comes, with the grey bars dividing the acts (or ten equal parts of a text without acts). The table counts the occurrences in each act. Juilland's D is close to 1 when a word is spread evenly through a text and close to 0 when it is bunched in one place; DP reads the other way round, from 0 for an even spread to 1."""
+    )
+    plot_dispersion(user_input, case_sensitive)
+
+
+@st.cache_data
+def plot_dispersion(user_input, case_sensitive=False):
+    ### one row of hit marks per work, over the act divisions, and a table of hits per act
+    import pandas as pd
+    import plotly.graph_objs as go
+
+    spreads = call_cached(get_dispersions, user_input, case_sensitive)
+    labels = work_labels([spread["corpus"] for spread in spreads])
+    data = []
+    legends = set()
+    for label, spread in zip(labels, spreads):
+        divisions = spread["part_starts"][1:]
+        name = "Act divisions" if spread["parts"] == "acts" else "Part divisions"
+        data.append(
+            go.Scatter(
+                x=divisions,
+                y=[label] * len(divisions),
+                mode="markers",
+                marker={"symbol": "line-ns-open", "size": 30, "color": "lightgray"},
+                name=name,
+                legendgroup=name,
+                showlegend=name not in legends,
+                hoverinfo="skip",
+            )
+        )
+        legends.add(name)
+        data.append(
+            go.Scatter(
+                x=spread["positions"],
+                y=[label] * len(spread["positions"]),
+                mode="markers",
+                marker={"symbol": "line-ns-open", "size": 20},
+                name=label,
+                showlegend=False,
+                hovertemplate="%{x:.1%} of the way in<extra>%{y}</extra>",
+            )
+        )
     layout = go.Layout(
-        title=f"Frequency of '{user_input}' in four of Shakespeare's works"
+        title=f"Where '{user_input}' appears in each of {len(spreads)} works",
+        xaxis={"title": "Position in the text", "range": [0, 1], "tickformat": ".0%"},
+        yaxis={"type": "category", "autorange": "reversed"},
+        height=120 + 60 * len(spreads),
     )
-    data = [trace]
+    st.plotly_chart(go.Figure(data=data, layout=layout))
+
+    rows = {}
+    for label, spread in zip(labels, spreads):
+        part = "Act" if spread["parts"] == "acts" else "Part"
+        row = {f"{part} {k}": n for k, n in enumerate(spread["part_counts"], 1)}
+        row["Juilland's D"] = spread["juilland_d"]
+        row["DP"] = spread["dp"]
+        rows[label] = row
+    df = pd.DataFrame.from_dict(rows, orient="index")
+    st.table(df.round({"Juilland's D": 2, "DP": 2}))
+
+
+def compare_many_words():
+    st.markdown("""#### Compare many words at once""")
+    st.markdown(
+        f"Enter several keywords or phrases, separated by commas, to compare how often each appears in {list_works()}."
+    )
+    user_terms = st.text_input(
+        """Enter keywords separated by commas 👇""",
+        value="black, white, fair, complexion",
+    )
+    chart = st.radio("Chart type", ["Grouped bars", "Heatmap"], horizontal=True)
+    terms = parse_terms(user_terms)
+    if terms and is_valid_query(" ".join(terms)):
+        plot_term_matrix(terms, chart)
+
+
+@st.cache_data
+def plot_term_matrix(terms, chart="Grouped bars"):
+    ### grouped bar chart or heatmap of the frequency of each term in each work
+    import plotly.graph_objs as go
+
+    df = call_cached(get_frequency_matrix, terms)
+    if chart == "Heatmap":
+        data = [
+            go.Heatmap(
+                z=df.values,
+                x=df.columns,
+                y=df.index,
+                colorscale="Teal",
+                texttemplate="%{z}",
+            )
+        ]
+        layout = go.Layout(title="Frequency of each term in each work")
+    else:
+        data = [go.Bar(name=label, x=df.columns, y=row) for label, row in df.iterrows()]
+        layout = go.Layout(
+            title="Frequency of each term in each work", barmode="group"
+        )
     fig = go.Figure(data=data, layout=layout)
     st.plotly_chart(fig)
 
 
 @st.cache_data
 def create_social_science_table():
+    import pandas as pd
+
     concordance_lines = [
         """This varied group of postmodern thinkers employs the tool of deconstruction
                 to critically evaluate indeed, to peel back the discursive layers of-development's 
@@ -248,6 +461,8 @@ def create_social_science_table():
 
 @st.cache_data
 def create_natural_science_table():
+    import pandas as pd
+
     concordance_lines = [
         "New",
         "Biological",
@@ -274,14 +489,134 @@ def create_natural_science_table():
     return df
 
 
+def collocation_controls(key):
+    """show the collocation settings and return (window, measure, stopwords, pos)"""
+    col1, col2 = st.columns(2)
+    window = col1.slider("Words on each side", 1, 10, 5, key=f"{key}_window")
+    measure = col2.selectbox("Rank collocates by", list(MEASURE_LABELS), key=f"{key}_measure")
+    ignore_stopwords = col1.checkbox(
+        "Ignore function words", value=True, key=f"{key}_stopwords"
+    )
+    adjectives = col2.checkbox(
+        "Adjectives only",
+        key=f"{key}_adjectives",
+        help="Approximate: each word is tagged on its own, not in the lines it occurs in, so a word that is usually an adjective is kept everywhere.",
+    )
+    return window, MEASURE_LABELS[measure], ignore_stopwords, "JJ" if adjectives else None
+
+
+def display_collocates(result, pos):
+    """show the top collocates returned by the api as a table"""
+    import pandas as pd
+
+    if pos is not None and not result["pos_applied"]:
+        st.warning(
+            "The part-of-speech tagger is not installed, so all collocates are shown. Run `python build_corpus.py --fetch-nltk` to install it."
+        )
+    found = [tuple(collocate.values()) for collocate in result["collocates"]]
+    if not found:
+        st.markdown("*No collocates found. Try a wider window or a more frequent word.*")
+        return
+    df = pd.DataFrame(
+        found,
+        columns=["Collocate", "Freq near node", "Freq in text", "Score"],
+        index=range(1, len(found) + 1),
+    )
+    st.table(df)
+
+
 def main():
     """
     Main function of the app. Use this to call function definitions above.
     Ultimately, this function is called by the root Streamlit app, main.py.
     """
 
+    # pick up texts added to or removed from data/ since the last run
+    if registry.refresh():
+        st.cache_data.clear()
+
+    show_profile = st.sidebar.checkbox(
+        "Show profiling panel", value=PROFILE_ALL_RUNS, key="show_profile"
+    )
+    with trace("page", enabled=show_profile or PROFILE_ALL_RUNS) as page_trace:
+        show_page()
+    if show_profile:
+        display_profile(page_trace)
+
+
+def display_profile(page_trace):
+    """show the timing spans, counters and sizes of this run, and the corpus store totals, in the sidebar"""
+    st.sidebar.markdown("### Profile of this run")
+    st.sidebar.caption(f"Total {page_trace.duration * 1000:.1f} ms")
+    rows = [
+        f"{'  ' * depth + name:<28}{duration * 1000:9.2f} ms"
+        for name, depth, _, duration in page_trace.spans
+    ]
+    st.sidebar.code("\n".join(rows) or "No spans recorded", language=None)
+    st.sidebar.markdown("**Counters and sizes**")
+    st.sidebar.json({**page_trace.counters, **page_trace.sizes})
+    st.sidebar.markdown("**Corpus store since startup**")
+    st.sidebar.json(store.stats())
+
+
+def display_user_results(user_text, user_term, case_sensitive=False):
+    """show the concordance, collocates and download of a key word in the user's text"""
+    user_corpus_id = tokenize(user_text)
+
+    # Display the first 25 results
+    st.markdown(
+        """*Browse all occurrences page by page below, or download your KWIC data as a file to your computer.*
+            """
+    )
+
+    display_kwic_pages(
+        user_term, user_corpus_id, "user_kwic", case_sensitive=case_sensitive
+    )
+
+    # Show the words that occur most often around the key word
+    with st.expander("Collocates of your key word"):
+        window, measure, ignore_stopwords, pos = collocation_controls("user")
+        result = api.collocations(
+            user_term,
+            [user_corpus_id],
+            window,
+            measure,
+            stopwords=ignore_stopwords,
+            pos=pos,
+            case_sensitive=case_sensitive,
+        )
+        display_collocates(result, pos)
+
+    # Allow the user to download all results, formatted one hit at a time. The
+    # file is only built in the run after "Prepare download" is clicked, not on
+    # every rerun of the page
+    export_format = st.radio(
+        "Download format", list(FORMATS), horizontal=True, key="export_format"
+    )
+    if not st.button("Prepare download", key="prepare_export"):
+        return
+    with span("export_kwic"):
+        kwic_export = "".join(
+            api.export(
+                user_corpus_id,
+                user_term,
+                export_format,
+                case_sensitive=case_sensitive,
+            )
+        )
+    count("bytes_exported", len(kwic_export))
+    st.download_button(
+        f"Download .{export_format} file",
+        kwic_export,
+        f"{user_term}_concordance.{export_format}",
+        mime=FORMATS[export_format],
+    )
+
+
+def show_page():
+    """write the sections of the page"""
     # set the customized heading sizes
-    css = read_file("style.css")
+    css = call_cached(read_file, "style.css")
     st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
 
     ### Section one: Introduction
@@ -331,20 +666,11 @@ index places the key word in a central column within a "context window," a chose
             st.markdown(
                 "This example uses the [The Folger Shakespeare](https://www.folger.edu/explore/shakespeares-works/download/) editions."
             )
-            freq_othello = len(
-                get_concordance(
-                    "black", othello_data, lines=MAX_LINES, width=100, display=False
-                )
-            )
-            display_freq("black", freq_othello, "Othello")
-            get_concordance("black", othello_data)
-            freq_lear = len(
-                get_concordance(
-                    "black", lear_data, lines=MAX_LINES, width=100, display=False
-                )
-            )
-            display_freq("black", freq_lear, "King Lear")
-            get_concordance("black", lear_data)
+            freqs = call_cached(get_frequencies, "black")
+            display_freq("black", freqs["othello.txt"], "Othello")
+            get_concordance("black", "othello.txt")
+            display_freq("black", freqs["king_lear.txt"], "King Lear")
+            get_concordance("black", "king_lear.txt")
 
             # section three: Expand the comparison
             st.markdown("#### Expand the comparison")
@@ -354,7 +680,7 @@ index places the key word in a central column within a "context window," a chose
                 as mine own face," and "i am black and have not those soft parts of conversation." In all these cases, Shakespeare mines the question of outward appearances and inward truth."""
             )
             st.markdown(
-                """We can also see that "blackness" is mentioned more often in *Othello* than *King Lear*. Let's compare the frequency of 'black' in four of Shakespeare's works: *Othello*, *King Lear*, *Taming of the Shrew*, and *The Merchant of Venice*."""
+                f"""We can also see that "blackness" is mentioned more often in *Othello* than *King Lear*. Let's compare the frequency of 'black' in {len(registry)} works: {list_works()}."""
             )
 
             plot_comparison("black")
@@ -365,6 +691,7 @@ index places the key word in a central column within a "context window," a chose
             What about if we wanted to study race in *The Merchant of Venice?* Or gender in the *The Taming of the Shrew*?"""
             )
             try_another_word()
+            compare_many_words()
     with tab2:
         with st.container(border=True):
             st.markdown("""## Understanding "deconstruction" as used by one author""")
@@ -409,44 +736,49 @@ index places the key word in a central column within a "context window," a chose
                     and therefore the authors came to the conclusion that it is important to acknowledge this when discussing the iGEM project.  
                     """
             )
+            st.markdown("#### Find collocates yourself")
+            st.markdown(
+                f"""We can run the same kind of analysis on {list_works()}. Enter a node word to list the words that occur most often within a few words of it. 
+                Ranking by frequency favours common words, while mutual information, t-score and log-likelihood compare each count with what we would expect by chance."""
+            )
+            node = st.text_input(
+                "Enter a node word 👇", value="love", key="collocation_node"
+            )
+            if node and is_valid_query(node):
+                window, measure, ignore_stopwords, pos = collocation_controls("plays")
+                result = api.collocations(
+                    node,
+                    window=window,
+                    measure=measure,
+                    stopwords=ignore_stopwords,
+                    pos=pos,
+                )
+                display_collocates(result, pos)
 
     ## Section three: Paste your own text
     st.markdown("## Explore concordances with your own text")
     st.markdown(
         """Try creating a KWIC index with your own text. For example, copy the text from a research article on [JSTOR](https://jstor.org) or a novel from
-                [Project Gutenberg](https://www.gutenberg.org/). *The maximum number of characters is 1,000,000.*
+                [Project Gutenberg](https://www.gutenberg.org/). *The maximum number of characters you can paste is 1,000,000. Longer texts can be uploaded as a .txt file.*
                 
                 """
     )
 
     user_text = st.text_area("Paste your text here", max_chars=1_000_000)
+    user_file = st.file_uploader("Or upload a .txt file", type="txt")
+    if user_file is not None:
+        user_text = user_file.getvalue().decode("utf-8", errors="replace")
     user_term = st.text_input("Enter your key word here", max_chars=20)
+    user_match_case = st.checkbox("Match case", key="user_match_case")
 
     # Create a download file and show first 25 results
-    if user_text and user_term:
-
-        # Collect all the results in a string
-        kwic_results = get_concordance(
-            user_term, user_text, lines=MAX_LINES, display=False
-        )
-        kwic_string = ""
-        for i in kwic_results:
-            kwic_string = kwic_string + i.line + "\n"
-
-        # Display the first 25 results
-        st.markdown(
-            """*Up to 25 occurrences are displayed. To view all occurrences, download your KWIC data as a text file to your computer.*
-                """
-        )
-
-        get_concordance(user_term, user_text, lines=25, display=True)
-
-        # Allow the user to download all results
-        st.download_button(
-            "Download .txt file",
-            kwic_string,
-            f"{user_term}_concordance.txt",
-        )
+    if user_text and user_term and is_valid_query(user_term):
+        try:
+            display_user_results(user_text, user_term, user_match_case)
+        except api.UnknownCorpusError:
+            # texts pasted in other sessions pushed this one out of the store
+            # part way through the run; the rerun indexes it again
+            st.rerun()
 
     ## Section four: Share Additional Learning Resources
     st.markdown("## Get more out of your analysis with code!")
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Benchmark suite for the paths the app runs on every query
+
+Times reading a text, tokenizing and indexing it, single-word and phrase
+concordances, the frequency counts behind the comparison charts and the KWIC
+download, on the bundled plays and on synthetic corpora built by sampling their
+lines. Each stage reports latency percentiles, throughput and peak memory. The
+library functions the app calls are benchmarked directly, so Streamlit is never
+started.
+
+Results can be saved as a baseline; a later run compared against it exits with
+status 1 when a stage got slower or uses more memory than the tolerance allows.
+
+Usage: python benchmarks/bench_paths.py [--sizes MB ...] [--no-plays] [--repeat N]
+           [--save-baseline FILE] [--compare FILE] [--tolerance FRACTION]
+
+Synthetic corpora go up to 500 MB (--sizes 1 10 100 500); tokenizing the
+largest ones needs several GB of memory and takes a long time.
+"""
+# Import libraries
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+# Define constants
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+from corpus_index import DATA_DIR, CorpusIndex, parse_query  # noqa: E402
+from kwic_export import export_kwic  # noqa: E402
+
+DEFAULT_SIZES_MB = (1, 10)
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+PERCENTILES = (50, 90, 99)
+# the queries the app runs by default: a single word, a phrase, and the terms
+# of the frequency comparison chart
+WORD_QUERY = "love"
+PHRASE_QUERY = "my lord"
+COMPARISON_TERMS = ("black", "white", "love", "the moor", "my lord")
+# app defaults for the number and width of concordance lines
+LINES = 25
+WIDTH = 100
+EXPORT_FORMAT = "csv"
+SEED = 0
+# differences smaller than these are noise, whatever the tolerance
+MIN_REGRESSION_SECONDS = 0.002
+MIN_REGRESSION_BYTES = 1 << 20
+MB = 1 << 20
+
+
+def synthetic_text(size_mb, seed=SEED):
+    """
+    build a text of about ``size_mb`` MB by sampling lines of the bundled plays,
+    so it has their vocabulary and word frequencies; the same seed gives the same text
+    """
+    lines = []
+    for path in sorted(DATA_DIR.glob("*.txt")):
+        with open(path, "r") as f:
+            lines.extend(line for line in f.read().splitlines(keepends=True) if line)
+    rng = random.Random(seed)
+    target = int(size_mb * MB)
+    parts = []
+    size = 0
+    while size < target:
+        batch = rng.choices(lines, k=10_000)
+        parts.extend(batch)
+        size += sum(len(line) for line in batch)
+    return "".join(parts)
+
+
+def read_text(path):
+    """read a text file the way the app's read_file does"""
+    with open(path, "r") as f:
+        return f.read()
+
+
+def measure(func, repeat, warmup=False):
+    """
+    Run ``func`` ``repeat`` times and return its timings in seconds, the peak
+    memory it allocated, measured by tracemalloc on one extra run, and the
+    value that run returned.
+    """
+    if warmup:
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        value = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return timings, peak, value
+
+
+def summarize(timings, peak, work, unit):
+    """the latency percentiles, throughput and peak memory of one stage"""
+    percentiles = np.percentile(timings, PERCENTILES)
+    result = {f"p{p}": float(value) for p, value in zip(PERCENTILES, percentiles)}
+    result["throughput"] = work / max(float(np.median(timings)), 1e-9)
+    result["unit"] = unit
+    result["peak_bytes"] = int(peak)
+    return result
+
+
+def bench_corpus(text_path, repeat, build_repeat):
+    """benchmark every stage on one text file, returning {stage: result}"""
+    text_mb = os.path.getsize(text_path) / MB
+    results = {}
+
+    timings, peak, text = measure(lambda: read_text(text_path), repeat)
+    results["read_file"] = summarize(timings, peak, text_mb, "MB/s")
+
+    timings, peak, corpus = measure(lambda: CorpusIndex.from_text(text), build_repeat)
+    results["tokenize"] = summarize(timings, peak, text_mb, "MB/s")
+
+    for stage, query in (
+        ("concordance_word", WORD_QUERY),
+        ("concordance_phrase", PHRASE_QUERY),
+    ):
+        phrase = parse_query(query)
+        timings, peak, _ = measure(
+            lambda: corpus.concordance_list(phrase, WIDTH, LINES), repeat, warmup=True
+        )
+        results[stage] = summarize(timings, peak, 1, "queries/s")
+
+    # plot_comparison counts one query in each work, compare_many_words several
+    phrase = parse_query(WORD_QUERY)
+    timings, peak, _ = measure(lambda: corpus.count(phrase), repeat, warmup=True)
+    results["frequency"] = summarize(timings, peak, 1, "queries/s")
+    phrases = [parse_query(term) for term in COMPARISON_TERMS]
+    timings, peak, _ = measure(lambda: corpus.count_many(phrases), repeat, warmup=True)
+    results["frequency_matrix"] = summarize(timings, peak, len(phrases), "queries/s")
+
+    # the download button joins the whole export into one string
+    timings, peak, export = measure(
+        lambda: "".join(export_kwic(corpus, phrase, EXPORT_FORMAT)), repeat
+    )
+    results["export"] = summarize(timings, peak, len(export) / MB, "MB/s")
+    return results
+
+
+def run(sizes, plays=True, repeat=5, build_repeat=3):
+    """benchmark the bundled plays and synthetic corpora of the given sizes in MB"""
+    results = {}
+    if plays:
+        for path in sorted(DATA_DIR.glob("*.txt")):
+            print(f"benchmarking {path.name}...", file=sys.stderr)
+            results[path.stem] = bench_corpus(path, repeat, build_repeat)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size_mb in sizes:
+            name = f"synthetic_{size_mb:g}mb"
+            print(f"benchmarking {name}...", file=sys.stderr)
+            path = Path(tmp_dir) / f"{name}.txt"
+            with open(path, "w") as f:
+                f.write(synthetic_text(size_mb))
+            results[name] = bench_corpus(path, repeat, build_repeat)
+            path.unlink()
+    return results
+
+
+def machine():
+    """where the benchmark ran, stored with baselines since timings depend on it"""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def report(results):
+    """print one line per corpus and stage"""
+    for name, stages in results.items():
+        for stage, result in stages.items():
+            percentiles = " ".join(
+                f"p{p} {result[f'p{p}'] * 1000:9.2f}ms" for p in PERCENTILES
+            )
+            print(
+                f"{name:<24} {stage:<19} {percentiles}  "
+                f"{result['throughput']:10.1f} {result['unit']:<9}  "
+                f"peak {result['peak_bytes'] / MB:8.1f} MB"
+            )
+
+
+def compare(results, baseline, tolerance):
+    """return a message for every stage that regressed against the baseline"""
+    regressions = []
+    for name, stages in results.items():
+        for stage, result in stages.items():
+            base = baseline.get(name, {}).get(stage)
+            if base is None:
+                continue
+            slower = result["p50"] - base["p50"]
+            if slower > base["p50"] * tolerance and slower > MIN_REGRESSION_SECONDS:
+                regressions.append(
+                    f"{name} {stage}: median {result['p50'] * 1000:.2f}ms, "
+                    f"baseline {base['p50'] * 1000:.2f}ms"
+                )
+            larger = result["peak_bytes"] - base["peak_bytes"]
+            if (
+                larger > base["peak_bytes"] * tolerance
+                and larger > MIN_REGRESSION_BYTES
+            ):
+                regressions.append(
+                    f"{name} {stage}: peak memory {result['peak_bytes'] / MB:.1f} MB, "
+                    f"baseline {base['peak_bytes'] / MB:.1f} MB"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark tokenization, query, frequency and export paths."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=float,
+        nargs="*",
+        default=list(DEFAULT_SIZES_MB),
+        help="sizes in MB of the synthetic corpora",
+    )
+    parser.add_argument(
+        "--no-plays", action="store_true", help="skip the bundled plays"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--build-repeat", type=int, default=3, help="repeats of the tokenize stage"
+    )
+    parser.add_argument("--save-baseline", type=Path, metavar="FILE")
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        nargs="?",
+        const=DEFAULT_BASELINE,
+        metavar="FILE",
+        help=f"fail on regressions against a baseline (default: {DEFAULT_BASELINE.name})",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed slowdown or memory growth as a fraction of the baseline",
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, not args.no_plays, args.repeat, args.build_repeat)
+    report(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"machine": machine(), "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"saved baseline to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        if baseline["machine"] != machine():
+            print(
+                "warning: the baseline was recorded on a different machine "
+                f"({baseline['machine']})"
+            )
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for regression in regressions:
+            print(f"FAIL: {regression}")
+        if regressions:
+            return 1
+        print(f"no regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
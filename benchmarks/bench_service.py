@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Load test of the concordance service with many concurrent clients
+
+Starts concordance_service.py on a free port (or uses --url) and has
+``--concurrency`` clients, each on its own keep-alive connection, send
+``--requests`` queries in total: concordance pages, frequency counts and
+frequency tables over the bundled works. Reports latency percentiles and
+throughput, and exits with status 1 if any request failed.
+
+Usage: python benchmarks/bench_service.py [--requests N] [--concurrency N] [--url URL]
+"""
+# Import libraries
+import argparse
+import asyncio
+import itertools
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+
+# Define constants
+APP_DIR = Path(__file__).resolve().parent.parent
+PERCENTILES = (50, 90, 99)
+QUERIES = ("love", "black", "my lord", "the moor", "d*", "/king(s)?/")
+
+
+async def request(reader, writer, method, path, body=None):
+    """send one request on a keep-alive connection and return (status, parsed body)"""
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode(
+            "latin-1"
+        )
+        + data
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    payload = await reader.readexactly(length)
+    return status, json.loads(payload) if payload else None
+
+
+def workload(corpora):
+    """an endless, repeatable mix of the requests the app makes"""
+    for k in itertools.count():
+        query = QUERIES[k % len(QUERIES)]
+        corpus = corpora[k % len(corpora)]
+        kind = k % 4
+        if kind < 2:
+            yield "POST", "/concordance", {
+                "corpus": corpus,
+                "query": query,
+                "page": k % 3,
+                "sort": None if kind == 0 else "R1",
+            }
+        elif kind == 2:
+            yield "POST", "/frequencies", {"query": query}
+        else:
+            yield "POST", "/frequency_matrix", {"terms": list(QUERIES[:4])}
+
+
+async def run_load(host, port, total, concurrency):
+    """return the latencies in seconds, the failed requests and the wall time"""
+    reader, writer = await asyncio.open_connection(host, port)
+    _, corpora = await request(reader, writer, "GET", "/corpora")
+    writer.close()
+    jobs = itertools.islice(workload([c["corpus"] for c in corpora]), total)
+    latencies = []
+    failures = []
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for method, path, body in jobs:
+                start = time.perf_counter()
+                status, payload = await request(reader, writer, method, path, body)
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    failures.append(f"{path} {body}: {status} {payload}")
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, failures, time.perf_counter() - start
+
+
+def start_service():
+    """start the service on a free port and return the process and its address"""
+    process = subprocess.Popen(
+        [sys.executable, "concordance_service.py", "--port", "0"],
+        cwd=APP_DIR,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = process.stdout.readline()
+    if not line.startswith("serving on "):
+        process.kill()
+        raise RuntimeError("the service did not start")
+    address = urlsplit(line.split()[-1])
+    return process, address.hostname, address.port
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the concordance service.")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--url", help="a running service (default: start one)")
+    args = parser.parse_args(argv)
+
+    process = None
+    if args.url:
+        address = urlsplit(args.url)
+        host, port = address.hostname, address.port
+    else:
+        process, host, port = start_service()
+    try:
+        latencies, failures, elapsed = asyncio.run(
+            run_load(host, port, args.requests, args.concurrency)
+        )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    percentiles = np.percentile(latencies, PERCENTILES) * 1000
+    print(
+        f"{len(latencies)} requests from {args.concurrency} concurrent clients in "
+        f"{elapsed:.2f}s: {len(latencies) / elapsed:.1f} requests/s, "
+        + ", ".join(f"p{p} {value:.1f}ms" for p, value in zip(PERCENTILES, percentiles))
+    )
+    for failure in failures[:10]:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
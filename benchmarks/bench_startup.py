@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Startup-time benchmark: how long a fresh interpreter takes to import app
+
+Exits with status 1 when the median import time is over the target, so it can
+guard cold starts in CI.
+
+Usage: python benchmarks/bench_startup.py [--repeat N] [--target SECONDS]
+"""
+# Import libraries
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+# Define constants
+APP_DIR = Path(__file__).resolve().parent.parent
+TARGET_SECONDS = 1.0
+MEASURE_IMPORT = (
+    "import time; start = time.perf_counter(); import app; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def measure_import():
+    """import app in a fresh interpreter and return the time it took in seconds"""
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE_IMPORT],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the import time of app.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--target", type=float, default=TARGET_SECONDS)
+    args = parser.parse_args(argv)
+
+    timings = [measure_import() for _ in range(args.repeat)]
+    median = statistics.median(timings)
+    print(
+        f"import app: median {median:.3f}s, min {min(timings):.3f}s, "
+        f"max {max(timings):.3f}s over {args.repeat} runs (target {args.target:.3f}s)"
+    )
+    if median > args.target:
+        print("FAIL: import time is over the target")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Offline build step for the corpus indexes
+
+Converts each text under data/ into a directory next to it holding the sorted
+vocabulary, the integer token-id array, the character span of each token and
+the postings, all as .npy files the app memory maps on startup.
+
+With --fetch-nltk it first downloads the tokenizer models into nltk_data/,
+which the app reads instead of downloading anything at startup. Without the
+punkt model, sentences are split at sentence-final punctuation; each index
+records the splitter it was built with and is rebuilt when that changes.
+
+Usage: python build_corpus.py [--fetch-nltk] [file name ...]
+"""
+# Import libraries
+import argparse
+import time
+
+from corpus_index import DATA_DIR, build_index, index_path
+from tokenization import NLTK_DATA_DIR, PUNKT, fetch_nltk_data, sentence_splitter
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build the corpus indexes under data/."
+    )
+    parser.add_argument(
+        "files",
+        nargs="*",
+        help="file names under data/ to build (default: every .txt file)",
+    )
+    parser.add_argument(
+        "--fetch-nltk",
+        action="store_true",
+        help="download the tokenizer models into nltk_data/ first",
+    )
+    args = parser.parse_args(argv)
+    if args.fetch_nltk:
+        fetch_nltk_data()
+        print(f"tokenizer models -> {NLTK_DATA_DIR}")
+    splitter = sentence_splitter()
+    if splitter != PUNKT:
+        print(
+            f"WARNING: the punkt model is not installed, sentences are split by the "
+            f"{splitter} fallback; run with --fetch-nltk to match nltk.word_tokenize"
+        )
+    fnames = args.files or sorted(path.name for path in DATA_DIR.glob("*.txt"))
+    for fname in fnames:
+        start = time.perf_counter()
+        index = build_index(fname)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{fname}: {len(index)} tokens, {len(index.vocab)} types "
+            f"-> {index_path(fname).name} ({elapsed:.2f}s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Collocation statistics computed from concordance hit positions
+"""
+# Import libraries
+from collections import namedtuple
+
+import numpy as np
+
+from corpus_index import Vocabulary
+
+# Define constants
+MEASURES = ("frequency", "mi", "t-score", "log-likelihood")
+# nltk's English stopword list, plus the clitics word_tokenize splits off and
+# the early modern function words that dominate the plays
+STOPWORDS = frozenset("""
+    i me my myself we our ours ourselves you your yours yourself yourselves he
+    him his himself she her hers herself it its itself they them their theirs
+    themselves what which who whom this that these those am is are was were be
+    been being have has had having do does did doing a an the and but if or
+    because as until while of at by for with about against between into through
+    during before after above below to from up down in out on off over under
+    again further then once here there when where why how all any both each few
+    more most other some such no nor not only own same so than too very s t can
+    will just don should now d ll m o re ve y ain ma
+    n't 's 'd 'll 're 've 'm 'st 't
+    thou thee thy thine ye hath doth dost art hast shall shalt would wilt
+    'tis 'twas tis twas o ay nay
+    """.split())
+Collocate = namedtuple("Collocate", ["word", "freq", "corpus_freq", "score"])
+WindowCounts = namedtuple(
+    "WindowCounts", ["vocab", "observed", "corpus_freq", "node_freq", "slots", "size"]
+)
+
+
+def window_counts(corpus, phrase, window=5, case_sensitive=False):
+    """
+    Count how often each vocabulary entry of a corpus occurs within ``window``
+    tokens to the left or right of the hits of a phrase. A token in the
+    windows of several hits is counted once, and the hits themselves are not
+    counted, so no word is seen near the node more often than in the corpus.
+    """
+    starts = np.asarray(corpus.find(phrase, case_sensitive), dtype=np.int64)
+    offsets = np.concatenate(
+        [np.arange(-window, 0), np.arange(len(phrase), len(phrase) + window)]
+    )
+    positions = (starts[:, None] + offsets[None, :]).ravel()
+    positions = positions[(positions >= 0) & (positions < len(corpus))]
+    nodes = (starts[:, None] + np.arange(len(phrase))[None, :]).ravel()
+    positions = np.setdiff1d(positions, nodes)
+    observed = np.bincount(corpus.ids[positions], minlength=len(corpus.vocab))
+    return WindowCounts(
+        corpus.vocab,
+        observed,
+        np.diff(corpus.offsets),
+        len(starts),
+        len(positions),
+        len(corpus),
+    )
+
+
+def merge_counts(counts):
+    """add up the window counts of several corpora over the union of their vocabularies"""
+    counts = list(counts)
+    if len(counts) == 1:
+        return counts[0]
+    words = sorted(set().union(*(c.vocab.tolist() for c in counts)))
+    lookup = {word: i for i, word in enumerate(words)}
+    inverse = np.array(
+        [lookup[word] for c in counts for word in c.vocab.tolist()], dtype=np.int64
+    )
+    vocab = Vocabulary.from_words(words)
+
+    def add(field):
+        values = np.concatenate([getattr(c, field) for c in counts])
+        return np.bincount(inverse, weights=values, minlength=len(vocab))
+
+    return WindowCounts(
+        vocab,
+        add("observed"),
+        add("corpus_freq"),
+        sum(c.node_freq for c in counts),
+        sum(c.slots for c in counts),
+        sum(c.size for c in counts),
+    )
+
+
+def _xlogx_ratio(observed, expected):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(observed > 0, observed * np.log(observed / expected), 0.0)
+
+
+def association(counts, measure="frequency"):
+    """
+    Score every vocabulary entry as a collocate: raw frequency in the window,
+    mutual information, t-score or log-likelihood (G2).
+    """
+    observed = counts.observed.astype(float)
+    corpus_freq = counts.corpus_freq.astype(float)
+    if measure == "frequency":
+        return observed
+    expected = corpus_freq * counts.slots / max(counts.size, 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if measure == "mi":
+            return np.where(observed > 0, np.log2(observed / expected), -np.inf)
+        if measure == "t-score":
+            return np.where(
+                observed > 0, (observed - expected) / np.sqrt(observed), 0.0
+            )
+    if measure == "log-likelihood":
+        # 2x2 contingency table: in the window or not, the collocate or another word
+        o11 = observed
+        o12 = counts.slots - observed
+        o21 = corpus_freq - observed
+        o22 = counts.size - counts.slots - o21
+        total = counts.size
+        rows = (o11 + o12, o21 + o22)
+        cols = (o11 + o21, o12 + o22)
+        g2 = 0.0
+        for cell, row, col in ((o11, 0, 0), (o12, 0, 1), (o21, 1, 0), (o22, 1, 1)):
+            g2 = g2 + _xlogx_ratio(cell, rows[row] * cols[col] / total)
+        return 2 * g2
+    raise ValueError(f"unknown measure {measure!r}, expected one of {MEASURES}")
+
+
+def _pos_filter(words, pos):
+    """keep the words whose tag, given to each word on its own, starts with ``pos``"""
+    import nltk
+
+    from tokenization import use_vendored_nltk_data
+
+    use_vendored_nltk_data()
+    tags = nltk.pos_tag_sents([[word] for word in words])
+    return np.array([tagged[0][1].startswith(pos) for tagged in tags], dtype=bool)
+
+
+def collocates(
+    counts,
+    top_k=20,
+    measure="frequency",
+    stopwords=STOPWORDS,
+    alphabetic=True,
+    pos=None,
+    min_freq=2,
+):
+    """
+    Return the top-k collocates of merged window counts, best first.
+
+    ``stopwords`` and ``alphabetic`` drop function words and punctuation;
+    ``pos`` keeps only words tagged with that part of speech (e.g. "JJ" for
+    adjectives). Each word is tagged on its own, out of context, so this
+    filter is approximate. Words seen fewer than ``min_freq`` times in the window are
+    ignored, which keeps MI from favouring one-off words.
+    """
+    scores = association(counts, measure)
+    keep = counts.observed >= max(min_freq, 1)
+    if stopwords or alphabetic:
+        words = counts.vocab.words(np.flatnonzero(keep))
+        allowed = [
+            (not stopwords or word not in stopwords)
+            and (not alphabetic or any(char.isalpha() for char in word))
+            for word in words
+        ]
+        keep[keep] = np.array(allowed, dtype=bool)
+    candidates = np.flatnonzero(keep)
+    # best first, ties broken by window frequency
+    order = np.lexsort((-counts.observed[candidates], -scores[candidates]))
+    candidates = candidates[order]
+
+    if pos:
+        # tag in batches, stopping as soon as enough collocates have been found
+        batch = max(top_k * 5, 100)
+        result = []
+        for start in range(0, len(candidates), batch):
+            chunk = candidates[start : start + batch]
+            chunk = chunk[_pos_filter(counts.vocab.words(chunk), pos)]
+            result.extend(chunk.tolist())
+            if len(result) >= top_k:
+                break
+        candidates = np.array(result[:top_k], dtype=np.int64)
+    else:
+        candidates = candidates[:top_k]
+
+    return [
+        Collocate(
+            counts.vocab[i],
+            int(counts.observed[i]),
+            int(counts.corpus_freq[i]),
+            float(scores[i]),
+        )
+        for i in candidates.tolist()
+    ]
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Headless API for loading corpora and running concordance queries
+
+Everything the app shows is computed here, without Streamlit: the registered
+works and pasted texts are referred to by corpus id, queries are the strings a
+user types, and the results are plain dicts and lists that serialize to JSON.
+The indexes live in the process-wide corpus store, so the app, the HTTP service
+and batch jobs in one process share them.
+"""
+# Import libraries
+import math
+from collections import OrderedDict
+from functools import partial
+
+from collocation import MEASURES, collocates, merge_counts, window_counts
+from corpus_index import SORT_KEYS, CorpusIndex, parse_query, validate_query
+from corpus_registry import registry
+from corpus_store import fingerprint, store
+from dispersion import DISPLAY_RESOLUTION, dispersion, downsample
+from kwic_export import FORMATS, export_kwic
+from profiling import span
+
+# Define constants
+TEXT_TITLE = "Your text"
+
+
+class UnknownCorpusError(KeyError):
+    """raised for a corpus id that is neither registered nor an indexed text"""
+
+
+def parse(query, case_sensitive=False):
+    """split a query string into words, raising ValueError if it is empty or has an invalid /regex/"""
+    words = parse_query(query, case_sensitive)
+    if not words:
+        raise ValueError("the query is empty")
+    validate_query(words)
+    return words
+
+
+def corpora():
+    """the registered works, in registry order"""
+    return [
+        {"corpus": info.corpus_id, "title": info.title, "author": info.author}
+        for info in registry
+    ]
+
+
+def title(corpus_id):
+    """the display title of a corpus"""
+    if corpus_id in registry:
+        return registry.info(corpus_id).title
+    return TEXT_TITLE
+
+
+def get_corpus(corpus_id):
+    """return the index of a registered work or of a text indexed by ``index_text``"""
+    if corpus_id in registry:
+        return registry.load(corpus_id)
+    corpus = store.get(corpus_id)
+    if corpus is None:
+        raise UnknownCorpusError(corpus_id)
+    return corpus
+
+
+def index_text(text, previous_id=None, progress=None):
+    """
+    Index a text and return its corpus id, a fingerprint of its content, so
+    the same text is indexed once for all its users, and its number of tokens.
+    When ``previous_id`` is the id of an earlier version of the text that is
+    still stored, only the sentences that changed are re-tokenized.
+    ``progress`` is called with the fraction of the text tokenized so far on a
+    full build.
+
+    Indexed texts are evicted from the store when other texts need the room,
+    after which their corpus id is unknown until they are indexed again.
+    """
+    corpus_id = fingerprint(text)
+    corpus = store.get(corpus_id)
+    if corpus is None:
+        previous = store.get(previous_id) if previous_id else None
+        if previous is not None and previous.text is not None:
+            with span("apply_edit"):
+                corpus = previous.apply_edit(text)
+        else:
+            with span("from_text"):
+                corpus = CorpusIndex.from_text(text, progress=progress)
+        corpus = store.put(corpus_id, corpus)
+    return {"corpus": corpus_id, "tokens": len(corpus)}
+
+
+def _map_corpora(func, corpus_ids=None):
+    """
+    run ``func(corpus)`` on the given corpora, every registered work by default;
+    ``func`` must be picklable, as large fan-outs run on worker processes
+    """
+    if corpus_ids is None or all(cid in registry for cid in corpus_ids):
+        return registry.fan_out(func, corpus_ids)
+    return OrderedDict((cid, func(get_corpus(cid))) for cid in corpus_ids)
+
+
+def _line_dict(line):
+    return {
+        "offset": line.offset,
+        "left": line.left_print,
+        "query": line.query,
+        "right": line.right_print,
+        "line": line.line,
+    }
+
+
+def concordance(
+    corpus_id,
+    query,
+    page=0,
+    page_size=25,
+    width=100,
+    sort=None,
+    case_sensitive=False,
+):
+    """
+    Return one page (numbered from 0) of the KWIC lines of a query in a
+    corpus, in document order or sorted by one of ``SORT_KEYS``, with the
+    total number of hits.
+    """
+    if sort is not None and sort not in SORT_KEYS:
+        raise ValueError(f"unknown sort {sort!r}, expected one of {SORT_KEYS}")
+    if page < 0 or page_size < 1:
+        raise ValueError("page must be >= 0 and page_size >= 1")
+    phrase = parse(query, case_sensitive)
+    corpus = get_corpus(corpus_id)
+    with span("concordance_page"):
+        lines, total = corpus.concordance_page(
+            phrase, page, page_size, width, sort, case_sensitive
+        )
+    return {
+        "corpus": corpus_id,
+        "query": query,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "lines": [_line_dict(line) for line in lines],
+    }
+
+
+def frequencies(query, case_sensitive=False, corpus_ids=None):
+    """the number of hits of a query in each corpus, every registered work by default"""
+    phrase = parse(query, case_sensitive)
+    counts = _map_corpora(
+        partial(CorpusIndex.count, phrase=phrase, case_sensitive=case_sensitive),
+        corpus_ids,
+    )
+    return [
+        {"corpus": cid, "title": title(cid), "count": int(count)}
+        for cid, count in counts.items()
+    ]
+
+
+def frequency_matrix(terms, corpus_ids=None):
+    """
+    the number of hits of each of several terms in each corpus, as a corpora x
+    terms table of counts
+    """
+    phrases = [parse(term) for term in terms]
+    counts = _map_corpora(partial(CorpusIndex.count_many, phrases=phrases), corpus_ids)
+    return {
+        "corpora": list(counts),
+        "titles": [title(cid) for cid in counts],
+        "terms": list(terms),
+        "counts": [row.tolist() for row in counts.values()],
+    }
+
+
+def _finite(value):
+    """a float as JSON allows it, None for nan"""
+    return None if math.isnan(value) else value
+
+
+def dispersions(
+    query,
+    corpus_ids=None,
+    parts=None,
+    resolution=DISPLAY_RESOLUTION,
+    case_sensitive=False,
+):
+    """
+    Return where the hits of a query fall in each corpus, every registered
+    work by default: their positions relative to the length of the text (0 to
+    1), thinned to at most ``resolution`` marks (all of them if None), the
+    number of hits in each act, or in ``parts`` parts of equal length, and
+    Juilland's D and DP, which are None without hits.
+    """
+    if parts is not None and parts < 2:
+        raise ValueError("parts must be at least 2")
+    if resolution is not None and resolution < 1:
+        raise ValueError("resolution must be at least 1")
+    phrase = parse(query, case_sensitive)
+    with span("dispersion"):
+        found = _map_corpora(
+            partial(
+                dispersion, phrase=phrase, parts=parts, case_sensitive=case_sensitive
+            ),
+            corpus_ids,
+        )
+    result = []
+    for cid, spread in found.items():
+        positions = spread.starts / max(spread.size, 1)
+        if resolution is not None:
+            positions = downsample(positions, resolution)
+        result.append(
+            {
+                "corpus": cid,
+                "title": title(cid),
+                "hits": len(spread.starts),
+                "tokens": spread.size,
+                "positions": positions.tolist(),
+                "parts": "acts" if spread.acts else "equal",
+                "part_starts": (spread.boundaries / max(spread.size, 1)).tolist(),
+                "part_counts": spread.counts.tolist(),
+                "juilland_d": _finite(spread.juilland_d),
+                "dp": _finite(spread.dp),
+                "dp_norm": _finite(spread.dp_norm),
+            }
+        )
+    return result
+
+
+def collocations(
+    query,
+    corpus_ids=None,
+    window=5,
+    measure="frequency",
+    top_k=20,
+    stopwords=True,
+    pos=None,
+    case_sensitive=False,
+):
+    """
+    Return the top collocates of a query over the given corpora, every
+    registered work by default. When the part-of-speech tagger is not
+    installed, ``pos`` is ignored and ``pos_applied`` is False.
+    """
+    if measure not in MEASURES:
+        raise ValueError(f"unknown measure {measure!r}, expected one of {MEASURES}")
+    if window < 1 or top_k < 1:
+        raise ValueError("window and top_k must be at least 1")
+    phrase = parse(query, case_sensitive)
+    with span("window_counts"):
+        counts = merge_counts(
+            _map_corpora(
+                partial(
+                    window_counts,
+                    phrase=phrase,
+                    window=window,
+                    case_sensitive=case_sensitive,
+                ),
+                corpus_ids,
+            ).values()
+        )
+    options = {"measure": measure}
+    if not stopwords:
+        options["stopwords"] = None
+    pos_applied = pos is not None
+    with span("collocates"):
+        try:
+            found = collocates(counts, top_k, pos=pos, **options)
+        except LookupError:
+            pos_applied = False
+            found = collocates(counts, top_k, **options)
+    return {
+        "query": query,
+        "collocates": [collocate._asdict() for collocate in found],
+        "pos_applied": pos_applied,
+    }
+
+
+def export(corpus_id, query, fmt="txt", width=100, sort=None, case_sensitive=False):
+    """
+    generate the KWIC export of a query in a corpus as strings in one of
+    ``FORMATS``, one hit at a time
+    """
+    if fmt not in FORMATS:
+        raise ValueError(
+            f"unknown export format {fmt!r}, expected one of {list(FORMATS)}"
+        )
+    phrase = parse(query, case_sensitive)
+    corpus = get_corpus(corpus_id)
+    return export_kwic(corpus, phrase, fmt, width, sort, case_sensitive)
@@ -0,0 +1,359 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Local HTTP/JSON service for concordance queries
+
+An asyncio front end accepts the connections and parses the requests, and a
+pool of worker threads runs the queries against the indexes in the
+process-wide corpus store, so every client shares one copy of each index.
+
+Usage: python concordance_service.py [--host HOST] [--port PORT] [--workers N]
+
+Endpoints (POST bodies and all responses are JSON):
+
+    GET  /health
+    GET  /corpora
+    POST /texts             {"text": ..., "previous": corpus id}
+    POST /concordance       {"corpus": ..., "query": ..., "page": 0, "page_size": 25,
+                             "width": 100, "sort": null, "case_sensitive": false}
+    POST /frequencies       {"query": ..., "case_sensitive": false, "corpora": [...]}
+    POST /frequency_matrix  {"terms": [...], "corpora": [...]}
+    POST /dispersion        {"query": ..., "corpora": [...], "parts": null,
+                             "resolution": 2000, "case_sensitive": false}
+    POST /collocations      {"query": ..., "corpora": [...], "window": 5,
+                             "measure": "frequency", "top_k": 20, "stopwords": true,
+                             "pos": null, "case_sensitive": false}
+    POST /export            {"corpus": ..., "query": ..., "format": "txt", ...}
+
+Errors are returned as {"error": message} with status 400 for a bad request
+and 404 for an unknown corpus or path.
+"""
+# Import libraries
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import concordance_api as api
+from kwic_export import FORMATS
+
+# Define constants
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 16 * 2**20
+MAX_HEADER_LINES = 100
+# the JSON types each request field may have; None allows null
+FIELD_TYPES = {
+    "text": (str,),
+    "previous": (str, None),
+    "corpus": (str,),
+    "query": (str,),
+    "page": (int,),
+    "page_size": (int,),
+    "width": (int,),
+    "sort": (str, None),
+    "case_sensitive": (bool,),
+    "window": (int,),
+    "measure": (str,),
+    "top_k": (int,),
+    "stopwords": (bool,),
+    "pos": (str, None),
+    "parts": (int, None),
+    "resolution": (int, None),
+    "format": (str,),
+}
+# fields holding a list of strings
+LIST_FIELDS = ("corpora", "terms")
+JSON_NAMES = {str: "a string", int: "an integer", bool: "a boolean", None: "null"}
+
+
+class RequestError(Exception):
+    """a request the service cannot answer, with the HTTP status to send"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _checked(field, value):
+    """return the value of a request field, raising RequestError if it has the wrong type"""
+    if field in LIST_FIELDS:
+        valid = isinstance(value, list) and all(isinstance(v, str) for v in value)
+        expected = "a list of strings"
+    else:
+        types = FIELD_TYPES[field]
+        # type() rather than isinstance, which would take true for an integer
+        valid = type(value) in types or (value is None and None in types)
+        expected = " or ".join(JSON_NAMES[t] for t in types)
+    if not valid:
+        raise RequestError(
+            HTTPStatus.BAD_REQUEST, f"field {field!r} must be {expected}"
+        )
+    return value
+
+
+def _options(body, names):
+    """the optional fields of a request body, renamed to the api's argument names"""
+    return {
+        arg: _checked(field, body[field])
+        for field, arg in names.items()
+        if field in body
+    }
+
+
+def _required(body, field):
+    try:
+        return _checked(field, body[field])
+    except KeyError:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"missing field {field!r}")
+
+
+def _texts(body):
+    options = _options(body, {"previous": "previous_id"})
+    return api.index_text(_required(body, "text"), **options)
+
+
+def _concordance(body):
+    options = _options(
+        body,
+        {
+            "page": "page",
+            "page_size": "page_size",
+            "width": "width",
+            "sort": "sort",
+            "case_sensitive": "case_sensitive",
+        },
+    )
+    return api.concordance(
+        _required(body, "corpus"), _required(body, "query"), **options
+    )
+
+
+def _frequencies(body):
+    options = _options(
+        body, {"case_sensitive": "case_sensitive", "corpora": "corpus_ids"}
+    )
+    return api.frequencies(_required(body, "query"), **options)
+
+
+def _frequency_matrix(body):
+    options = _options(body, {"corpora": "corpus_ids"})
+    return api.frequency_matrix(_required(body, "terms"), **options)
+
+
+def _dispersion(body):
+    options = _options(
+        body,
+        {
+            "corpora": "corpus_ids",
+            "parts": "parts",
+            "resolution": "resolution",
+            "case_sensitive": "case_sensitive",
+        },
+    )
+    return api.dispersions(_required(body, "query"), **options)
+
+
+def _collocations(body):
+    options = _options(
+        body,
+        {
+            "corpora": "corpus_ids",
+            "window": "window",
+            "measure": "measure",
+            "top_k": "top_k",
+            "stopwords": "stopwords",
+            "pos": "pos",
+            "case_sensitive": "case_sensitive",
+        },
+    )
+    return api.collocations(_required(body, "query"), **options)
+
+
+def _export(body):
+    options = _options(
+        body,
+        {
+            "format": "fmt",
+            "width": "width",
+            "sort": "sort",
+            "case_sensitive": "case_sensitive",
+        },
+    )
+    chunks = api.export(_required(body, "corpus"), _required(body, "query"), **options)
+    return "".join(chunks)
+
+
+# (method, path) -> handler of the parsed JSON body
+ROUTES = {
+    ("GET", "/health"): lambda body: {"status": "ok"},
+    ("GET", "/corpora"): lambda body: api.corpora(),
+    ("POST", "/texts"): _texts,
+    ("POST", "/concordance"): _concordance,
+    ("POST", "/frequencies"): _frequencies,
+    ("POST", "/frequency_matrix"): _frequency_matrix,
+    ("POST", "/dispersion"): _dispersion,
+    ("POST", "/collocations"): _collocations,
+    ("POST", "/export"): _export,
+}
+
+
+def dispatch(method, path, body):
+    """run the handler of a request and return its result, raising RequestError if it fails"""
+    handler = ROUTES.get((method, path))
+    if handler is None:
+        raise RequestError(HTTPStatus.NOT_FOUND, f"no such endpoint: {method} {path}")
+    try:
+        return handler(body)
+    except api.UnknownCorpusError as err:
+        raise RequestError(HTTPStatus.NOT_FOUND, f"unknown corpus {err.args[0]!r}")
+    except ValueError as err:
+        raise RequestError(HTTPStatus.BAD_REQUEST, str(err))
+
+
+class ConcordanceService:
+    """an asyncio HTTP/1.1 server handing the queries to a thread pool"""
+
+    def __init__(self, workers=None):
+        self.pool = ThreadPoolExecutor(
+            max_workers=workers or min(32, (os.cpu_count() or 1) + 4)
+        )
+
+    async def _read_request(self, reader):
+        """return (method, path, headers, body) of the next request, or None at end of stream"""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split()
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "malformed request line")
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "too many headers")
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise RequestError(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "request body too large"
+            )
+        body = await reader.readexactly(length) if length else b""
+        return method, target.split("?", 1)[0], headers, body
+
+    @staticmethod
+    def _response(status, payload, content_type="application/json", keep_alive=True):
+        if content_type == "application/json":
+            payload = json.dumps(payload)
+        data = payload.encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        return head.encode("latin-1") + data
+
+    async def _answer(self, method, path, raw_body):
+        """run one request on the worker pool and return its payload and content type"""
+        try:
+            body = json.loads(raw_body) if raw_body else {}
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "the body is not valid JSON")
+        if not isinstance(body, dict):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "the body must be a JSON object")
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.pool, dispatch, method, path, body)
+        if path == "/export":
+            return result, FORMATS[body.get("format", "txt")]
+        return result, "application/json"
+
+    async def handle(self, reader, writer):
+        """serve the requests of one connection until the client closes it"""
+        try:
+            while True:
+                # a request that could not be read leaves the stream unusable
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, raw_body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    payload, content_type = await self._answer(method, path, raw_body)
+                    response = self._response(
+                        HTTPStatus.OK, payload, content_type, keep_alive
+                    )
+                except RequestError as err:
+                    response = self._response(
+                        err.status, {"error": str(err)}, keep_alive=keep_alive
+                    )
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception as err:
+                    logging.getLogger(__name__).exception("error serving a request")
+                    keep_alive = False
+                    response = self._response(
+                        HTTPStatus.INTERNAL_SERVER_ERROR,
+                        {"error": repr(err)},
+                        keep_alive=False,
+                    )
+                writer.write(response)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+        """
+        serve until cancelled; ``ready`` is called with the bound (host, port),
+        which tells the port picked when ``port`` is 0
+        """
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[:2])
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve concordance queries over HTTP/JSON."
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT, help="0 picks a free port"
+    )
+    parser.add_argument("--workers", type=int, help="number of query worker threads")
+    args = parser.parse_args(argv)
+
+    service = ConcordanceService(args.workers)
+
+    def ready(address):
+        print(f"serving on http://{address[0]}:{address[1]}", flush=True)
+
+    try:
+        asyncio.run(service.serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
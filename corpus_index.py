@@ -0,0 +1,936 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Positional inverted index for concordance queries
+"""
+# Import libraries
+import errno
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+
+import numpy as np
+
+from profiling import record, span
+from tokenization import edit_region, sentence_splitter, tokenize_spans
+
+# Define constants
+DATA_DIR = Path(__file__).parent / "data"
+INDEX_SUFFIX = ".index"
+INDEX_VERSION = 5
+# arrays that are memory mapped from disk rather than read into each process
+MAPPED_ARRAYS = ("ids", "offsets", "positions", "spans")
+VOCAB_ARRAYS = ("vocab", "vocab_bounds")
+TEXT_ARRAYS = ("text_wide", "text_extra")
+
+
+WILDCARDS = re.compile(r"[*?]+")
+REGEX_META = set(".^$*+?{}[]\\|()")
+# sorts after every character, so prefix + MAX_CHAR bounds all words with that prefix
+MAX_CHAR = "\U0010ffff"
+# the orders KWIC lines can be sorted in, besides document order
+SORT_KEYS = ("node", "L1", "L2", "L3", "R1", "R2", "R3")
+SORT_CACHE_SIZE = 32
+# words longer than this are left out of the suffix array and matched directly
+MAX_SUFFIX_WORD = 100
+WHITESPACE = re.compile(r"\s+")
+
+
+# the same fields as nltk.text.ConcordanceLine, without importing nltk to query
+ConcordanceLine = namedtuple(
+    "ConcordanceLine",
+    ["left", "query", "right", "offset", "left_print", "right_print", "line"],
+)
+
+
+def cut_string(s, width):
+    """
+    Cut a string to a display width like ``nltk.util.cut_string``: from the
+    start if width >= 0, from the end otherwise, not counting combining characters.
+    """
+    result = []
+    chars = reversed(s) if width < 0 else iter(s)
+    width_sofar = 0
+    for char in chars:
+        if width_sofar >= abs(width):
+            break
+        result.append(char)
+        if not unicodedata.combining(char):
+            width_sofar += 1
+    if width < 0:
+        result.reverse()
+    return "".join(result)
+
+
+def is_regex(word):
+    """a query word written as /regex/ is matched as an anchored regular expression"""
+    return len(word) > 2 and word.startswith("/") and word.endswith("/")
+
+
+def is_pattern(word):
+    """whether a query word is a wildcard (* or ?) or /regex/ pattern"""
+    return is_regex(word) or WILDCARDS.search(word) is not None
+
+
+def parse_query(input_string, case_sensitive=False):
+    """
+    split a query into words, lowercasing every word except /regex/ patterns
+    unless the query is matched case-sensitively
+    """
+    if case_sensitive:
+        return input_string.split()
+    return [word if is_regex(word) else word.lower() for word in input_string.split()]
+
+
+def validate_query(words):
+    """raise ValueError if a /regex/ word of a parsed query is not a valid regular expression"""
+    for word in words:
+        if is_regex(word):
+            try:
+                re.compile(word[1:-1])
+            except re.error as err:
+                raise ValueError(f"{word} is not a valid regular expression: {err}")
+
+
+def _wildcard_regex(word):
+    """
+    translate a wildcard word into a regex: ``*`` matches any characters, ``?``
+    one character, and everything else, brackets included, only itself
+    """
+    return "".join(
+        ".*" if char == "*" else "." if char == "?" else re.escape(char)
+        for char in word
+    )
+
+
+def _literal_prefix(regex):
+    """return the literal characters every match of a regex starts with"""
+    if "|" in regex:
+        # the alternatives of /love|hate/ do not share the prefix of the first one
+        return ""
+    prefix = []
+    for char in regex:
+        if char in REGEX_META:
+            # a quantifier makes the preceding character optional
+            if char in "?*{" and prefix:
+                prefix.pop()
+            break
+        prefix.append(char)
+    return "".join(prefix)
+
+
+def _prefix_range(sorted_words, prefix):
+    """return the [lo, hi) range of a sorted array holding the words with a prefix"""
+    lo = sorted_words.searchsorted(prefix, side="left")
+    hi = sorted_words.searchsorted(prefix + MAX_CHAR, side="left")
+    return int(lo), int(hi)
+
+
+def _bisect(key_at, size, word, side="left"):
+    """
+    the index at which a word would be inserted among ``size`` sorted UTF-8
+    byte strings, the i-th of which is ``key_at(i)``
+    """
+    key = word.encode("utf-8")
+    lo, hi = 0, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        found = key_at(mid)
+        if found < key or (side == "right" and found == key):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class Vocabulary:
+    """
+    The sorted distinct words of a text, stored as one UTF-8 byte array and the
+    offsets of the words in it (word ``i`` is ``blob[bounds[i]:bounds[i + 1]]``).
+    Its size grows with the total length of the words, not with the number of
+    words times the longest one as a fixed-width string array would. UTF-8
+    bytes sort like the code points they encode, so the words are in the same
+    order as sorted Python strings.
+    """
+
+    def __init__(self, blob, bounds):
+        self.blob = blob
+        self.bounds = bounds
+        self._view = memoryview(blob)
+        # plain views skip the per-index overhead of np.memmap
+        self._bounds = bounds.view(np.ndarray)
+
+    def __reduce__(self):
+        # a memoryview cannot be pickled, so rebuild it from the arrays
+        return Vocabulary, (np.asarray(self.blob), np.asarray(self.bounds))
+
+    @classmethod
+    def from_words(cls, words):
+        """build the vocabulary of a sorted list of distinct words"""
+        encoded = [word.encode("utf-8") for word in words]
+        bounds = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(word) for word in encoded], out=bounds[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), bounds)
+
+    def __len__(self):
+        return len(self.bounds) - 1
+
+    @property
+    def nbytes(self):
+        return self.blob.nbytes + self.bounds.nbytes
+
+    def _bytes(self, i):
+        return self._view[self._bounds[i] : self._bounds[i + 1]].tobytes()
+
+    def __getitem__(self, i):
+        return str(self._view[self._bounds[i] : self._bounds[i + 1]], "utf-8")
+
+    def words(self, ids):
+        """return the words with some ids as a list of strings"""
+        ids = np.asarray(ids, dtype=np.int64)
+        view = self._view
+        return [
+            str(view[start:end], "utf-8")
+            for start, end in zip(
+                self._bounds[ids].tolist(), self._bounds[ids + 1].tolist()
+            )
+        ]
+
+    def tolist(self):
+        return self.words(np.arange(len(self)))
+
+    def searchsorted(self, word, side="left"):
+        """the index at which a word would be inserted to keep the words sorted"""
+        return _bisect(self._bytes, len(self), word, side)
+
+    def get(self, word, default=None):
+        """return the id of a word, or ``default`` if it is not in the vocabulary"""
+        i = self.searchsorted(word)
+        return i if i < len(self) and self[i] == word else default
+
+    def __contains__(self, word):
+        return self.get(word) is not None
+
+    def insert(self, positions, words):
+        """
+        return a new vocabulary with sorted words inserted before the words at
+        ``positions``, as returned by ``searchsorted``
+        """
+        encoded = [word.encode("utf-8") for word in words]
+        lengths = np.array([len(word) for word in encoded], dtype=np.int64)
+        blob = np.insert(
+            self.blob,
+            np.repeat(self.bounds[positions], lengths),
+            np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        )
+        sizes = np.insert(np.diff(self.bounds), positions, lengths)
+        bounds = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=bounds[1:])
+        return Vocabulary(blob, bounds)
+
+    def select(self, keep):
+        """return a new vocabulary holding the words where a boolean mask is set"""
+        sizes = np.diff(self.bounds)
+        bounds = np.zeros(int(np.sum(keep)) + 1, dtype=np.int64)
+        np.cumsum(sizes[keep], out=bounds[1:])
+        return Vocabulary(self.blob[np.repeat(keep, sizes)], bounds)
+
+
+class MappedText:
+    """
+    A text stored as UTF-8 in a memory-mapped file, sliced by character offset
+    like the ``str`` it was saved from. ``wide`` holds the offsets of the
+    characters outside ASCII and ``extra`` the number of bytes the encodings
+    of the first ``k`` of them add, so a character offset maps to a byte
+    offset with one binary search.
+    """
+
+    def __init__(self, data, wide, extra):
+        self.data = data
+        self.wide = wide.view(np.ndarray)
+        self.extra = extra.view(np.ndarray)
+        self._view = memoryview(data)
+
+    @staticmethod
+    def tables(text):
+        """return the ``wide`` and ``extra`` arrays of a string"""
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        wide = np.flatnonzero(codes >= 0x80)
+        sizes = 1 + (codes[wide] >= 0x800).astype(np.int64) + (codes[wide] >= 0x10000)
+        extra = np.zeros(len(wide) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=extra[1:])
+        return wide, extra
+
+    def byte_offsets(self, offsets):
+        """map character offsets (an int or an array) to byte offsets"""
+        if not len(self.wide):
+            return offsets
+        return offsets + self.extra[np.searchsorted(self.wide, offsets)]
+
+    def __len__(self):
+        return len(self.data) - int(self.extra[-1])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, _ = key.indices(len(self))
+            start, stop = self.byte_offsets(
+                np.array([start, max(start, stop)])
+            ).tolist()
+            return str(self._view[start:stop], "utf-8")
+        key = key + len(self) if key < 0 else key
+        return self[key : key + 1]
+
+    def __str__(self):
+        return str(self._view, "utf-8")
+
+    def slices(self, spans):
+        """return the substrings of an (n, 2) array of character spans"""
+        view = self._view
+        return [
+            str(view[start:end], "utf-8")
+            for start, end in self.byte_offsets(np.asarray(spans)).tolist()
+        ]
+
+
+class SuffixArray:
+    """
+    The suffixes of the words of a ``Vocabulary`` in sorted order, kept as byte
+    offsets into its blob with the id of the word each belongs to, so the
+    table grows with the total length of the words. Words longer than
+    ``MAX_SUFFIX_WORD`` characters are left out and listed in ``long_ids``,
+    so one huge token cannot blow up the table or the time to sort it.
+    """
+
+    def __init__(self, vocab):
+        self.vocab = vocab
+        blob = vocab.blob.tobytes()
+        bounds = vocab.bounds.tolist()
+        starts, ids, long_ids = [], [], []
+        for i, word in enumerate(vocab.tolist()):
+            start, end = bounds[i], bounds[i + 1]
+            if len(word) > MAX_SUFFIX_WORD:
+                long_ids.append(i)
+            elif end - start == len(word):
+                starts.extend(range(start, end))
+                ids.extend([i] * len(word))
+            else:
+                for char in word:
+                    starts.append(start)
+                    ids.append(i)
+                    start += len(char.encode("utf-8"))
+        order = sorted(
+            range(len(starts)), key=lambda k: blob[starts[k] : bounds[ids[k] + 1]]
+        )
+        self.starts = np.array(starts, dtype=np.int64)[order]
+        self.ids = np.array(ids, dtype=np.int64)[order]
+        self.long_ids = np.array(long_ids, dtype=np.int64)
+
+    def _bytes(self, i):
+        end = self.vocab.bounds[self.ids[i] + 1]
+        return self.vocab._view[self.starts[i] : end].tobytes()
+
+    def searchsorted(self, word, side="left"):
+        """the index at which a suffix would be inserted to keep the suffixes sorted"""
+        return _bisect(self._bytes, len(self.starts), word, side)
+
+
+class CorpusIndex:
+    """
+    A positional inverted index over the tokens of one text.
+
+    The lowercased tokens are stored as compact integer ids into a sorted
+    vocabulary, together with the character span of each token in the original
+    text, which the index keeps to show hits in their original case. The postings
+    are kept in compressed sparse row form: the positions of the token with id
+    ``t`` are ``positions[offsets[t]:offsets[t + 1]]``, in ascending order.
+    """
+
+    def __init__(self, vocab, ids, offsets, positions, spans, text=None):
+        self.vocab = vocab
+        self.ids = ids
+        self.offsets = offsets
+        self.positions = positions
+        self.spans = spans
+        self.text = text
+        # sorted suffixes of the vocabulary for suffix and infix patterns, built on first use
+        self._suffixes = None
+        # full sort orders of recent queries, so later pages are not re-sorted
+        self._sort_cache = OrderedDict()
+        self._sort_lock = threading.Lock()
+        # indexes are shared between sessions, so make them read-only
+        for array in (vocab.blob, vocab.bounds, ids, offsets, positions, spans):
+            array.flags.writeable = False
+
+    @classmethod
+    def from_tokens(cls, tokens, spans=None, text=None):
+        """
+        build the index for a list of tokens and, optionally, their character
+        spans in the text they come from; matching ignores the case of the tokens
+        """
+        tokens = [token.lower() for token in tokens]
+        words = sorted(set(tokens))
+        lookup = {word: i for i, word in enumerate(words)}
+        ids = np.fromiter(map(lookup.__getitem__, tokens), np.int64, len(tokens))
+        return cls.from_ids(Vocabulary.from_words(words), ids, spans, text)
+
+    @classmethod
+    def from_ids(cls, vocab, ids, spans=None, text=None):
+        """build the index for token ids into a sorted ``Vocabulary``"""
+        ids = ids.astype(np.min_scalar_type(max(len(vocab) - 1, 0)))
+        # a stable sort by id keeps the positions of each token in document order
+        positions = np.argsort(ids, kind="stable").astype(np.int32)
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ids, minlength=len(vocab)), out=offsets[1:])
+        if spans is None:
+            spans = np.zeros((len(ids), 2), dtype=np.int32)
+        return cls(vocab, ids, offsets, positions, spans, text)
+
+    @classmethod
+    def from_text(cls, data_string, progress=None):
+        """
+        tokenize a text and build its index; ``progress`` is called with the
+        fraction of the text tokenized so far
+        """
+        with span("tokenize"):
+            tokens, spans = tokenize_spans(data_string, progress)
+        with span("build_index"):
+            index = cls.from_tokens(tokens, spans, data_string)
+        record("chars", len(data_string))
+        record("tokens", len(index))
+        return index
+
+    def apply_edit(self, new_string):
+        """
+        Return the index of an edited version of the text this index was built
+        from. Only the sentences the edit touched are re-tokenized; the ids and
+        spans of the tokens around them are reused, and the postings are
+        rebuilt from the patched id array with vectorized operations.
+        """
+        with span("edit_region"):
+            start, old_end, new_end = edit_region(str(self.text), new_string)
+        with span("tokenize"):
+            region_tokens, region_spans = tokenize_spans(new_string[start:new_end])
+        record("retokenized_chars", new_end - start)
+        region_tokens = [token.lower() for token in region_tokens]
+        # the tokens wholly before and after the edited sentences
+        before = int(np.searchsorted(self.spans[:, 1], start, side="right"))
+        after = int(np.searchsorted(self.spans[:, 0], old_end, side="left"))
+
+        # merge the new words into the sorted vocabulary and renumber the old ids
+        region_words = {t: self.vocab.get(t) for t in set(region_tokens)}
+        new_words = sorted(
+            t for t, token_id in region_words.items() if token_id is None
+        )
+        vocab, old_ranks, new_ranks = self.vocab, np.arange(len(self.vocab)), {}
+        if new_words:
+            inserts = np.array(
+                [self.vocab.searchsorted(t) for t in new_words], dtype=np.int64
+            )
+            vocab = self.vocab.insert(inserts, new_words)
+            old_ranks = (
+                old_ranks
+                + np.cumsum(np.bincount(inserts, minlength=len(self.vocab) + 1))[
+                    : len(self.vocab)
+                ]
+            )
+            new_ranks = dict(
+                zip(new_words, (inserts + np.arange(len(inserts))).tolist())
+            )
+        region_ids = [
+            new_ranks[t] if t in new_ranks else old_ranks[region_words[t]]
+            for t in region_tokens
+        ]
+        ids = np.concatenate(
+            [
+                old_ranks[self.ids[:before]],
+                np.array(region_ids, dtype=np.int64),
+                old_ranks[self.ids[after:]],
+            ]
+        )
+        spans = np.concatenate(
+            [
+                self.spans[:before],
+                region_spans + start,
+                self.spans[after:] + (new_end - old_end),
+            ]
+        ).astype(np.int32)
+        # drop the words the edit removed from the text
+        used = np.bincount(ids, minlength=len(vocab)) > 0
+        if not used.all():
+            ids = (np.cumsum(used) - 1)[ids]
+            vocab = vocab.select(used)
+        return CorpusIndex.from_ids(vocab, ids, spans, new_string)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        """
+        approximate private memory held by the index; memory-mapped arrays live
+        in the shared page cache and are not counted
+        """
+        arrays = (
+            self.vocab.blob,
+            self.vocab.bounds,
+            self.ids,
+            self.offsets,
+            self.positions,
+            self.spans,
+        )
+        private = [array for array in arrays if not isinstance(array, np.memmap)]
+        text_bytes = len(self.text) if isinstance(self.text, str) else 0
+        return sum(array.nbytes for array in private) + text_bytes
+
+    def save(self, path, **meta):
+        """
+        write the index to a directory of .npy files; ``meta`` is stored in
+        its meta.json along with the format version
+        """
+        path = Path(path)
+        # write to a temporary directory first so concurrent readers never see a
+        # partial index; its name is unique, so concurrent writers never share it
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = Path(
+            tempfile.mkdtemp(prefix=f"{path.name}.", suffix=".tmp", dir=path.parent)
+        )
+        for name, array in zip(VOCAB_ARRAYS, (self.vocab.blob, self.vocab.bounds)):
+            np.save(tmp_path / f"{name}.npy", array)
+        for name in MAPPED_ARRAYS:
+            np.save(tmp_path / f"{name}.npy", getattr(self, name))
+        if self.text is not None:
+            text = str(self.text)
+            with open(tmp_path / "text.txt", "w", encoding="utf-8", newline="") as f:
+                f.write(text)
+            for name, array in zip(TEXT_ARRAYS, MappedText.tables(text)):
+                np.save(tmp_path / f"{name}.npy", array)
+        with open(tmp_path / "meta.json", "w") as f:
+            json.dump({"version": INDEX_VERSION, "tokens": len(self), **meta}, f)
+        old_paths = []
+        try:
+            while True:
+                try:
+                    os.replace(tmp_path, path)
+                    break
+                except OSError as err:
+                    if err.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                        raise
+                # an index is in place: move it aside, unless another writer just did
+                old_paths.append(tmp_path.with_suffix(f".{len(old_paths)}.old"))
+                try:
+                    os.replace(path, old_paths[-1])
+                except FileNotFoundError:
+                    pass
+        finally:
+            for old_path in old_paths:
+                shutil.rmtree(old_path, ignore_errors=True)
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        read an index written by ``save``; by default every array and the text
+        are memory mapped, so worker processes share their pages and each
+        index costs next to no private memory
+        """
+        path = Path(path)
+        with open(path / "meta.json", "r") as f:
+            meta = json.load(f)
+        if meta["version"] != INDEX_VERSION:
+            raise ValueError(f"{path} was written by an incompatible version")
+        mmap_mode = "r" if mmap else None
+        arrays = {
+            name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode)
+            for name in MAPPED_ARRAYS
+        }
+        vocab = Vocabulary(
+            *(
+                np.load(path / f"{name}.npy", mmap_mode=mmap_mode)
+                for name in VOCAB_ARRAYS
+            )
+        )
+        text_path = path / "text.txt"
+        text = None
+        if text_path.exists() and not mmap:
+            with open(text_path, "r", encoding="utf-8", newline="") as f:
+                text = f.read()
+        elif text_path.exists():
+            data = np.zeros(0, dtype=np.uint8)
+            if text_path.stat().st_size:
+                # an empty file cannot be memory mapped
+                data = np.memmap(text_path, dtype=np.uint8, mode="r")
+            text = MappedText(
+                data,
+                *(
+                    np.load(path / f"{name}.npy", mmap_mode=mmap_mode)
+                    for name in TEXT_ARRAYS
+                ),
+            )
+        return cls(vocab, text=text, **arrays)
+
+    def _suffix_table(self):
+        if self._suffixes is None:
+            self._suffixes = SuffixArray(self.vocab)
+        return self._suffixes
+
+    def expand(self, word):
+        """
+        Return the sorted vocabulary ids matching a query word: the word itself,
+        a wildcard pattern (``*`` for any characters, ``?`` for one), or an
+        anchored ``/regex/``. Prefixes are resolved on the sorted vocabulary,
+        suffixes and infixes on its sorted suffixes, so no token is scanned.
+        The vocabulary is lowercase, so words and patterns match regardless of
+        case; ``find`` filters the hits by case when asked to.
+        """
+        if not is_regex(word):
+            word = word.lower()
+        if not is_pattern(word):
+            token_id = self.vocab.get(word)
+            return np.array([] if token_id is None else [token_id], dtype=np.int64)
+
+        if is_regex(word):
+            regex = re.compile(word[1:-1], re.IGNORECASE)
+            prefix = _literal_prefix(word[1:-1]).lower()
+            infix = ""
+        else:
+            regex = re.compile(_wildcard_regex(word))
+            literals = WILDCARDS.split(word)
+            prefix = literals[0]
+            infix = max(literals, key=len)
+            if prefix and word == prefix + "*":
+                return np.arange(*_prefix_range(self.vocab, prefix), dtype=np.int64)
+
+        if prefix:
+            candidates = np.arange(*_prefix_range(self.vocab, prefix), dtype=np.int64)
+        elif infix:
+            suffixes = self._suffix_table()
+            if word == "*" + infix:
+                lo = suffixes.searchsorted(infix, side="left")
+                hi = suffixes.searchsorted(infix, side="right")
+            else:
+                lo, hi = _prefix_range(suffixes, infix)
+            candidates = np.unique(suffixes.ids[lo:hi])
+            if word in ("*" + infix, "*" + infix + "*") and not len(suffixes.long_ids):
+                return candidates
+            # words too long for the suffix array are checked against the pattern
+            candidates = np.union1d(candidates, suffixes.long_ids)
+        else:
+            # a regex without a literal prefix is checked against every vocabulary entry
+            candidates = np.arange(len(self.vocab), dtype=np.int64)
+        words = self.vocab.words(candidates)
+        matched = [regex.fullmatch(w) is not None for w in words]
+        return candidates[np.array(matched, dtype=bool)]
+
+    def word_positions(self, word):
+        """return the sorted positions of a single token or pattern, in any case"""
+        token_ids = self.expand(word)
+        if len(token_ids) == 1:
+            token_id = token_ids[0]
+            return self.positions[self.offsets[token_id] : self.offsets[token_id + 1]]
+        postings = [
+            self.positions[self.offsets[token_id] : self.offsets[token_id + 1]]
+            for token_id in token_ids.tolist()
+        ]
+        # merge the postings of all matching tokens into one sorted hit list
+        return np.sort(np.concatenate(postings + [self.positions[:0]]))
+
+    def find(self, phrase, case_sensitive=False):
+        """
+        return the sorted start positions of a phrase (a list of tokens); a
+        case-sensitive search keeps the hits written exactly as the query
+        """
+        if not phrase:
+            return self.positions[:0]
+        postings = [self.word_positions(word) for word in phrase]
+        # intersect starting from the rarest word so the candidate set stays small
+        rarest = min(range(len(phrase)), key=lambda k: len(postings[k]))
+        starts = postings[rarest] - rarest
+        for k, word_positions in enumerate(postings):
+            if k != rarest and len(starts):
+                starts = np.intersect1d(starts, word_positions - k, assume_unique=True)
+        starts = starts[starts >= 0]
+        if case_sensitive:
+            starts = self._match_case(starts, phrase)
+        return starts
+
+    def _match_case(self, starts, phrase):
+        """keep the hits whose tokens are written in the case of the query words"""
+        for k, word in enumerate(phrase):
+            if is_regex(word):
+                regex = re.compile(word[1:-1])
+            else:
+                regex = re.compile(
+                    _wildcard_regex(word) if is_pattern(word) else re.escape(word)
+                )
+            forms = self.surface_forms(starts + k)
+            keep = [regex.fullmatch(form) is not None for form in forms]
+            starts = starts[np.array(keep, dtype=bool)]
+        return starts
+
+    def count(self, phrase, case_sensitive=False):
+        """return the number of hits of a phrase without building any context"""
+        if case_sensitive:
+            return len(self.find(phrase, case_sensitive))
+        if len(phrase) == 1:
+            token_ids = self.expand(phrase[0])
+            return int(np.sum(self.offsets[token_ids + 1] - self.offsets[token_ids]))
+        return len(self.find(phrase))
+
+    def count_many(self, phrases, case_sensitive=False):
+        """
+        return an array with the number of hits of each phrase; single words are
+        counted together from the postings offsets
+        """
+        if case_sensitive:
+            return np.array(
+                [self.count(phrase, case_sensitive) for phrase in phrases],
+                dtype=np.int64,
+            )
+        counts = np.zeros(len(phrases), dtype=np.int64)
+        words = [
+            k
+            for k, phrase in enumerate(phrases)
+            if len(phrase) == 1 and not is_pattern(phrase[0])
+        ]
+        word_ids = np.array(
+            [self.vocab.get(phrases[k][0], -1) for k in words], dtype=np.int64
+        )
+        found = word_ids >= 0
+        word_ids = word_ids[found]
+        counts[np.array(words, dtype=np.int64)[found]] = (
+            self.offsets[word_ids + 1] - self.offsets[word_ids]
+        )
+        for k, phrase in enumerate(phrases):
+            if len(phrase) > 1 or (phrase and is_pattern(phrase[0])):
+                counts[k] = self.count(phrase)
+        return counts
+
+    def tokens(self, start, stop):
+        """return the tokens between two positions as a list of strings"""
+        start = max(start, 0)
+        return self.vocab.words(self.ids[start:stop])
+
+    def surface_forms(self, positions):
+        """
+        return the tokens at some positions as written in the original text;
+        tokens the tokenizer rewrote, like quotes, are returned as tokens
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        tokens = self.vocab.words(self.ids[positions])
+        if self.text is None:
+            return tokens
+        if isinstance(self.text, MappedText):
+            forms = self.text.slices(self.spans[positions])
+        else:
+            forms = [
+                self.text[start:end] for start, end in self.spans[positions].tolist()
+            ]
+        return [
+            form if form.lower() == token else token
+            for form, token in zip(forms, tokens)
+        ]
+
+    def char_span(self, start, stop):
+        """return the [start, end) character offsets of the tokens between two positions"""
+        return int(self.spans[start, 0]), int(self.spans[stop - 1, 1])
+
+    def _text_between(self, start, end):
+        """the original text between two character offsets, on one line"""
+        return WHITESPACE.sub(" ", self.text[start:end])
+
+    def iter_concordance(self, phrase, width=79, starts=None, case_sensitive=False):
+        """
+        Generate the concordance lines of a phrase one at a time, formatted like
+        ``nltk.Text.concordance_list``. ``starts`` restricts the lines to the
+        given hit positions, which default to every hit of the phrase. The key
+        word and its context are cut from the original text by character
+        offset, so they keep their case, punctuation and spacing: the printed
+        context ends or starts with a space only where the text has one.
+        """
+        phrase_str = " ".join(phrase)
+        phrase_len = sum(1 for char in phrase_str if not unicodedata.combining(char))
+        half_width = (width - phrase_len - 2) // 2
+        context = width // 4  # approx number of words of context
+
+        if starts is None:
+            starts = self.find(phrase, case_sensitive)
+        for i in starts.tolist():
+            stop = i + len(phrase)
+            # like nltk, the right context ends ``context`` tokens after the start of the hit
+            right_end = min(max(i + context, stop), len(self))
+            left_context = self.surface_forms(range(max(i - context, 0), i))
+            right_context = self.surface_forms(range(stop, right_end))
+            if self.text is None:
+                query_word = " ".join(self.tokens(i, stop))
+                left_text = "".join(token + " " for token in left_context)
+                right_text = "".join(" " + token for token in right_context)
+            else:
+                start_char, end_char = self.char_span(i, stop)
+                query_word = self._text_between(start_char, end_char).strip()
+                left_text = self._text_between(
+                    self.spans[max(i - context, 0), 0], start_char
+                )
+                right_text = self._text_between(end_char, self.spans[right_end - 1, 1])
+            left_print = cut_string(left_text, -half_width).rjust(half_width)
+            right_print = cut_string(right_text, half_width)
+            line_print = left_print + query_word + right_print
+            yield ConcordanceLine(
+                left_context,
+                query_word,
+                right_context,
+                i,
+                left_print,
+                right_print,
+                line_print,
+            )
+
+    def _sort_offsets(self, phrase_len, sort):
+        """the token offsets from a hit that make up a sort key, most significant first"""
+        if sort == "node":
+            return list(range(phrase_len)) + [phrase_len]
+        side, distance = sort[0], int(sort[1])
+        if side == "L":
+            return [-d for d in range(distance, 4)]
+        return [phrase_len + d - 1 for d in range(distance, 4)]
+
+    def sort_key(self, starts, phrase_len, sort):
+        """
+        Return an int64 sort key per hit packing the token ids around it. Token
+        ids are ranks in the sorted vocabulary, so the keys order the hits
+        alphabetically by context, and missing context (at the edges of the
+        text) sorts first.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"unknown sort {sort!r}, expected one of {SORT_KEYS}")
+        bits = (len(self.vocab) + 1).bit_length()
+        offsets = self._sort_offsets(phrase_len, sort)[: max(63 // bits, 1)]
+        starts = np.asarray(starts, dtype=np.int64)
+        key = np.zeros(len(starts), dtype=np.int64)
+        for offset in offsets:
+            positions = starts + offset
+            valid = (positions >= 0) & (positions < len(self))
+            ranks = np.zeros(len(starts), dtype=np.int64)
+            ranks[valid] = self.ids[positions[valid]].astype(np.int64) + 1
+            key = (key << bits) | ranks
+        return key
+
+    def sorted_hits(self, phrase, sort=None, stop=None, case_sensitive=False):
+        """
+        Return the hit positions of a phrase in document order or sorted by
+        ``sort`` (one of ``SORT_KEYS``), ties staying in document order. When
+        only the first ``stop`` hits are wanted, they are found by partial
+        selection; full orders are cached for the following pages.
+        """
+        starts = self.find(phrase, case_sensitive)
+        if sort is None:
+            return starts[:stop]
+        cache_key = (tuple(phrase), sort, case_sensitive)
+        with self._sort_lock:
+            order = self._sort_cache.get(cache_key)
+        if order is not None:
+            return order[:stop]
+
+        key = self.sort_key(starts, len(phrase), sort)
+        if stop is not None and stop < len(starts):
+            # top-k selection: every hit with a key below the k-th, then ties in document order
+            kth = np.partition(key, stop - 1)[stop - 1]
+            smaller = np.flatnonzero(key < kth)
+            equal = np.flatnonzero(key == kth)[: stop - len(smaller)]
+            chosen = np.concatenate([smaller, equal])
+            return starts[chosen[np.argsort(key[chosen], kind="stable")]]
+
+        order = starts[np.argsort(key, kind="stable")]
+        with self._sort_lock:
+            self._sort_cache[cache_key] = order
+            while len(self._sort_cache) > SORT_CACHE_SIZE:
+                self._sort_cache.popitem(last=False)
+        return order[:stop]
+
+    def concordance_page(
+        self, phrase, page, page_size=25, width=79, sort=None, case_sensitive=False
+    ):
+        """
+        return the concordance lines of one page of hits (numbered from 0),
+        optionally sorted by context, and the total number of hits; only the
+        lines of that page are built
+        """
+        with span("count"):
+            total = self.count(phrase, case_sensitive)
+        with span("sorted_hits"):
+            if page == 0:
+                page_starts = self.sorted_hits(
+                    phrase, sort, stop=page_size, case_sensitive=case_sensitive
+                )
+            else:
+                page_starts = self.sorted_hits(
+                    phrase, sort, case_sensitive=case_sensitive
+                )[page * page_size : (page + 1) * page_size]
+        with span("build_lines"):
+            lines = list(self.iter_concordance(phrase, width, page_starts))
+        return lines, total
+
+    def concordance_list(self, phrase, width=79, lines=25, case_sensitive=False):
+        """
+        Build the concordance lines of a phrase, formatted like
+        ``nltk.Text.concordance_list``.
+        """
+        with span("find"):
+            starts = self.find(phrase, case_sensitive)[:lines]
+        with span("build_lines"):
+            return list(self.iter_concordance(phrase, width, starts))
+
+
+def index_path(fname, data_dir=DATA_DIR):
+    """return the path of the saved index for a file under data/"""
+    return Path(data_dir) / (Path(fname).stem + INDEX_SUFFIX)
+
+
+def _read_meta(meta_path):
+    """the meta.json of a saved index, or an empty dict if it cannot be read"""
+    try:
+        with open(meta_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_index(fname, data_dir=DATA_DIR):
+    """
+    Load the saved index of a file under data/, building and saving it first
+    if it is missing, older than the text, or was tokenized with another
+    sentence splitter than the one installed now.
+    """
+    text_path = Path(data_dir) / fname
+    saved_path = index_path(fname, data_dir)
+    meta_path = saved_path / "meta.json"
+    if (
+        meta_path.exists()
+        and meta_path.stat().st_mtime >= text_path.stat().st_mtime
+        and _read_meta(meta_path).get("splitter") == sentence_splitter()
+    ):
+        try:
+            return CorpusIndex.load(saved_path)
+        except (OSError, ValueError, KeyError):
+            pass
+    index = build_index(fname, data_dir)
+    try:
+        return CorpusIndex.load(saved_path)
+    except (OSError, ValueError, KeyError):
+        # another thread is swapping in its own copy; use the one just built
+        return index
+
+
+def build_index(fname, data_dir=DATA_DIR):
+    """tokenize a file under data/ and save its index next to it"""
+    with open(Path(data_dir) / fname, "r") as f:
+        index = CorpusIndex.from_text(f.read())
+    index.save(index_path(fname, data_dir), splitter=sentence_splitter())
+    return index
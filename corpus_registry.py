@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Registry of the corpora under data/ and fan-out of queries across them
+"""
+# Import libraries
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+
+from corpus_index import DATA_DIR, load_index
+from corpus_store import store
+from profiling import span
+
+# Define constants
+METADATA_FILE = "corpora.json"
+CorpusInfo = namedtuple("CorpusInfo", ["corpus_id", "title", "author", "path"])
+# fan-outs over fewer tokens than this run on the calling thread, where sending
+# the query to worker processes would cost more than it saves
+PARALLEL_MIN_TOKENS = 1_000_000
+
+# the registries of the worker processes, by data directory
+_worker_registries = {}
+
+
+def read_header(path):
+    """
+    Read the title and author from the first lines of a text, which follow the
+    Folger layout: the title, then "by <author>". Falls back to the file name.
+    """
+    title = path.stem.replace("_", " ").title()
+    author = None
+    with open(path, "r") as f:
+        lines = [f.readline().strip() for _ in range(2)]
+    if lines[0]:
+        title = lines[0]
+    if lines[1].lower().startswith("by "):
+        author = lines[1][3:].strip()
+    return title, author
+
+
+def _query_in_worker(data_dir, corpus_ids, query):
+    """run ``query`` on some corpora in a worker process, which maps their indexes once"""
+    worker_registry = _worker_registries.get(data_dir)
+    if worker_registry is None:
+        worker_registry = _worker_registries[data_dir] = CorpusRegistry(data_dir)
+    return [query(worker_registry.load(cid)) for cid in corpus_ids]
+
+
+class CorpusRegistry:
+    """
+    The corpora discovered under a data directory, in a stable display order.
+
+    Texts listed in ``corpora.json`` come first, in the order listed and with
+    the metadata given there; every other ``.txt`` file follows, sorted by file
+    name, with metadata read from its header. Corpus ids are file names.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, corpus_store=store, max_workers=None):
+        self.data_dir = Path(data_dir)
+        self.store = corpus_store
+        self.max_workers = max_workers or os.cpu_count()
+        self._infos = OrderedDict()
+        self._scanned_mtime = None
+        self._lock = threading.Lock()
+        self._pool = None
+        self.refresh()
+
+    def refresh(self):
+        """
+        rediscover the corpora if the data directory has changed since the last
+        scan; return whether the set of corpora changed
+        """
+        mtime = self.data_dir.stat().st_mtime_ns
+        if mtime == self._scanned_mtime:
+            return False
+        with self._lock:
+            infos = self._discover()
+            changed = list(infos.values()) != list(self._infos.values())
+            self._infos = infos
+            self._scanned_mtime = mtime
+        return changed
+
+    def _discover(self):
+        metadata_path = self.data_dir / METADATA_FILE
+        listed = []
+        if metadata_path.exists():
+            with open(metadata_path, "r") as f:
+                listed = json.load(f)
+
+        infos = OrderedDict()
+        for entry in listed:
+            path = self.data_dir / entry["file"]
+            if path.is_file():
+                title, author = read_header(path)
+                infos[entry["file"]] = CorpusInfo(
+                    entry["file"],
+                    entry.get("title", title),
+                    entry.get("author", author),
+                    path,
+                )
+        for path in sorted(self.data_dir.glob("*.txt")):
+            if path.name not in infos:
+                infos[path.name] = CorpusInfo(path.name, *read_header(path), path)
+        return infos
+
+    def __iter__(self):
+        return iter(list(self._infos.values()))
+
+    def __len__(self):
+        return len(self._infos)
+
+    def __contains__(self, corpus_id):
+        return corpus_id in self._infos
+
+    def info(self, corpus_id):
+        """return the metadata of a corpus"""
+        return self._infos[corpus_id]
+
+    @property
+    def titles(self):
+        return [info.title for info in self]
+
+    def load(self, corpus_id):
+        """return the index of a corpus, loaded once per process"""
+        return self.store.get_or_build(
+            corpus_id, lambda: load_index(corpus_id, self.data_dir), pinned=True
+        )
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # like the tokenizer pool, started from a clean forkserver process
+                # so the threads of the app and the service are not forked
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("forkserver"),
+                )
+        return self._pool
+
+    def fan_out(self, query, corpus_ids=None):
+        """
+        Run ``query(corpus)`` on every registered corpus (or the given ones)
+        and return an ordered dict of the results by corpus id, in registry order.
+
+        The per-hit work of most queries holds the GIL, so threads would not
+        run them in parallel. Fan-outs over at least ``PARALLEL_MIN_TOKENS``
+        tokens are instead split into one batch of corpora per worker process;
+        the workers memory map the same index files, so the indexes are shared
+        rather than copied, and ``query`` must be picklable (a module-level
+        function or a ``functools.partial`` of one). Smaller fan-outs run on
+        the calling thread.
+        """
+        if corpus_ids is None:
+            corpus_ids = list(self._infos)
+        corpora = [self.load(cid) for cid in corpus_ids]
+        workers = min(self.max_workers, len(corpus_ids))
+        if workers <= 1 or sum(map(len, corpora)) < PARALLEL_MIN_TOKENS:
+            return OrderedDict(
+                (cid, query(corpus)) for cid, corpus in zip(corpus_ids, corpora)
+            )
+        batches = [corpus_ids[k::workers] for k in range(workers)]
+        pool = self._get_pool()
+        # the worker processes record nothing, so time the whole fan-out here
+        with span("fan_out"):
+            futures = [
+                pool.submit(_query_in_worker, self.data_dir, batch, query)
+                for batch in batches
+            ]
+            results = {}
+            for batch, future in zip(batches, futures):
+                results.update(zip(batch, future.result()))
+        return OrderedDict((cid, results[cid]) for cid in corpus_ids)
+
+
+# the registry of the bundled texts under data/
+registry = CorpusRegistry()
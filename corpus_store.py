@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Process-wide store of indexed corpora shared by all sessions
+"""
+# Import libraries
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from profiling import count
+
+# Define constants
+DEFAULT_MAX_BYTES = int(os.environ.get("CONCORDANCE_STORE_MAX_BYTES", 512 * 2**20))
+
+
+def fingerprint(data_string):
+    """return a short content fingerprint of a text, used as its corpus id"""
+    digest = hashlib.blake2b(data_string.encode("utf-8"), digest_size=16)
+    return "text:" + digest.hexdigest()
+
+
+class CorpusStore:
+    """
+    A thread-safe store of read-only corpus indexes keyed by corpus id.
+
+    Pinned entries (the bundled works) are never evicted. Unpinned entries
+    (user-pasted texts) are evicted least recently used first whenever the
+    total size of the store goes over ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._pinned = set()
+        # key -> lock held by the thread building that corpus
+        self._building = {}
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        # process-wide totals since startup
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """the number and size of the stored corpora and the hit, miss and eviction totals"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._nbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def get(self, key):
+        """return the corpus stored under a key, or None"""
+        with self._lock:
+            corpus = self._entries.get(key)
+            if corpus is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        count("store.hit" if corpus is not None else "store.miss")
+        return corpus
+
+    def put(self, key, corpus, pinned=False):
+        """
+        store a corpus, evicting unpinned entries to stay within the budget; the
+        corpus just stored is kept, even when it alone is over the budget, until
+        the next one is stored
+        """
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                self._entries.move_to_end(key)
+                return existing
+            self._entries[key] = corpus
+            self._nbytes += corpus.nbytes
+            if pinned:
+                self._pinned.add(key)
+            self._evict(keep=key)
+            return corpus
+
+    def get_or_build(self, key, build, pinned=False):
+        """
+        return the corpus stored under a key, building and storing it if missing;
+        threads missing the same key wait for one build instead of each running it
+        """
+        corpus = self.get(key)
+        if corpus is not None:
+            return corpus
+        # build outside the store lock so other keys are not blocked meanwhile
+        with self._lock:
+            building = self._building.setdefault(key, threading.Lock())
+        try:
+            with building:
+                with self._lock:
+                    corpus = self._entries.get(key)
+                if corpus is None:
+                    corpus = self.put(key, build(), pinned=pinned)
+        finally:
+            with self._lock:
+                if self._building.get(key) is building:
+                    del self._building[key]
+        return corpus
+
+    def _evict(self, keep=None):
+        for key in list(self._entries):
+            if self._nbytes <= self.max_bytes:
+                break
+            if key not in self._pinned and key != keep:
+                self._nbytes -= self._entries.pop(key).nbytes
+                self.evictions += 1
+                count("store.eviction")
+
+
+# the store shared by every session of this process
+store = CorpusStore()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Dispersion statistics computed from concordance hit positions
+"""
+# Import libraries
+from collections import namedtuple
+
+import numpy as np
+
+# Define constants
+# texts without acts are split into this many parts of equal length
+DEFAULT_PARTS = 10
+# hits closer together than 1/DISPLAY_RESOLUTION of the text draw as one mark
+DISPLAY_RESOLUTION = 2000
+Dispersion = namedtuple(
+    "Dispersion",
+    ["starts", "size", "boundaries", "acts", "counts", "juilland_d", "dp", "dp_norm"],
+)
+
+
+def act_starts(corpus):
+    """
+    return the positions of the act headings of a play, the lines reading
+    "ACT <number>" in the Folger texts; empty if the corpus has no text
+    """
+    starts = corpus.word_positions("act")
+    starts = starts[starts + 1 < len(corpus)]
+    if corpus.text is None or not len(starts):
+        return starts[:0]
+    numbered = np.array(
+        [word.isdigit() for word in corpus.vocab.words(corpus.ids[starts + 1])],
+        dtype=bool,
+    )
+    upper = np.array([form == "ACT" for form in corpus.surface_forms(starts)])
+    line_start = np.array(
+        [
+            start == 0 or corpus.text[start - 1] == "\n"
+            for start in corpus.spans[starts, 0].tolist()
+        ]
+    )
+    return starts[numbered & upper & line_start]
+
+
+def equal_parts(size, parts=DEFAULT_PARTS):
+    """
+    the start positions of ``parts`` parts of a text of ``size`` tokens, of near
+    equal length; a text shorter than ``parts`` tokens gets one part per token
+    """
+    return np.unique(np.arange(parts, dtype=np.int64) * size // parts)
+
+
+def part_counts(starts, boundaries, size):
+    """
+    return the number of hits in each part of a text and the length of each
+    part in tokens, given the sorted start positions of the parts
+    """
+    parts = np.searchsorted(boundaries, starts, side="right") - 1
+    counts = np.bincount(parts, minlength=len(boundaries))
+    sizes = np.diff(np.append(boundaries, size))
+    return counts, sizes
+
+
+def juilland_d(counts, sizes):
+    """
+    Juilland's D of the hit counts in the parts along the last axis: 1 when
+    the hits are spread in proportion to the part lengths, 0 when they all
+    fall in one part, and nan without hits
+    """
+    counts = np.asarray(counts, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates = counts / np.asarray(sizes, dtype=float)
+        variation = rates.std(axis=-1) / rates.mean(axis=-1)
+        return 1 - variation / np.sqrt(counts.shape[-1] - 1)
+
+
+def dp(counts, sizes, normalize=False):
+    """
+    Gries's deviation of proportions of the hit counts in the parts along the
+    last axis: 0 when the hits are spread in proportion to the part lengths,
+    close to 1 (exactly 1 if ``normalize``) when they all fall in the smallest
+    part, and nan without hits
+    """
+    counts = np.asarray(counts, dtype=float)
+    expected = np.asarray(sizes, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = expected / expected.sum(axis=-1, keepdims=True)
+        observed = counts / counts.sum(axis=-1, keepdims=True)
+        deviation = 0.5 * np.abs(observed - expected).sum(axis=-1)
+        if normalize:
+            deviation = deviation / (1 - expected.min(axis=-1))
+    return deviation
+
+
+def dispersion(corpus, phrase, parts=None, case_sensitive=False):
+    """
+    Find the hits of a phrase and measure how evenly they are spread over the
+    text. The parts are the acts when ``parts`` is None and the text has at
+    least two (the front matter counts as part of the first act), or else
+    ``parts`` (by default ``DEFAULT_PARTS``) parts of equal length.
+    """
+    starts = np.asarray(corpus.find(phrase, case_sensitive), dtype=np.int64)
+    size = len(corpus)
+    boundaries = act_starts(corpus) if parts is None else []
+    acts = len(boundaries) >= 2
+    if acts:
+        boundaries = np.asarray(boundaries, dtype=np.int64)
+        boundaries[0] = 0
+    else:
+        boundaries = equal_parts(size, parts or DEFAULT_PARTS)
+    counts, sizes = part_counts(starts, boundaries, size)
+    return Dispersion(
+        starts,
+        size,
+        boundaries,
+        acts,
+        counts,
+        float(juilland_d(counts, sizes)),
+        float(dp(counts, sizes)),
+        float(dp(counts, sizes, normalize=True)),
+    )
+
+
+def downsample(relative, resolution=DISPLAY_RESOLUTION):
+    """
+    keep the first of the sorted relative positions (between 0 and 1) that
+    fall in each of ``resolution`` equal slices of the text, so a dense term
+    draws at most ``resolution`` marks and looks the same at that resolution
+    """
+    relative = np.asarray(relative)
+    slices = np.minimum((relative * resolution).astype(np.int64), resolution - 1)
+    keep = np.flatnonzero(np.diff(slices, prepend=-1))
+    return relative[keep]
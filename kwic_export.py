@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Streaming export of KWIC results
+
+The exporters are generators that format one hit at a time, so memory use does
+not grow with the number of hits. They also run from the command line:
+
+Usage: python kwic_export.py TEXT KEYWORD [--format txt|csv|tsv|jsonl] [--sort KEY] [--output FILE]
+
+TEXT is either a file name under data/ or a path to any text file.
+"""
+# Import libraries
+import argparse
+import csv
+import io
+import json
+import sys
+from pathlib import Path
+
+from corpus_index import (
+    DATA_DIR,
+    SORT_KEYS,
+    CorpusIndex,
+    load_index,
+    parse_query,
+    validate_query,
+)
+
+# Define constants
+FORMATS = {
+    "txt": "text/plain",
+    "csv": "text/csv",
+    "tsv": "text/tab-separated-values",
+    "jsonl": "application/jsonl",
+}
+FIELDS = ["token_offset", "char_start", "char_end", "left", "match", "right"]
+
+
+def iter_records(corpus, phrase, width=100, sort=None, case_sensitive=False):
+    """generate one dict per hit with its offsets, context and matched form"""
+    starts = corpus.sorted_hits(phrase, sort, case_sensitive=case_sensitive)
+    for line in corpus.iter_concordance(phrase, width, starts):
+        char_start, char_end = corpus.char_span(line.offset, line.offset + len(phrase))
+        yield {
+            "token_offset": line.offset,
+            "char_start": char_start,
+            "char_end": char_end,
+            "left": " ".join(line.left),
+            "match": line.query,
+            "right": " ".join(line.right),
+            "line": line.line,
+        }
+
+
+def _iter_delimited(records, delimiter):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator="\n")
+    writer.writerow(FIELDS)
+    for record in records:
+        writer.writerow([record[field] for field in FIELDS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_kwic(corpus, phrase, fmt="txt", width=100, sort=None, case_sensitive=False):
+    """
+    Generate the KWIC export of a phrase as a sequence of strings in one of
+    ``FORMATS``: the plain concordance lines, CSV, TSV or JSON lines. The hits
+    are in document order, or sorted by one of ``SORT_KEYS``.
+    """
+    records = iter_records(corpus, phrase, width, sort, case_sensitive)
+    if fmt == "txt":
+        return (record["line"] + "\n" for record in records)
+    if fmt == "csv":
+        return _iter_delimited(records, ",")
+    if fmt == "tsv":
+        return _iter_delimited(records, "\t")
+    if fmt == "jsonl":
+        return (
+            json.dumps({field: record[field] for field in FIELDS}) + "\n"
+            for record in records
+        )
+    raise ValueError(f"unknown export format {fmt!r}, expected one of {list(FORMATS)}")
+
+
+def open_corpus(text):
+    """index a file name under data/ from its saved index, or any other text file"""
+    if (DATA_DIR / text).is_file():
+        return load_index(text)
+    with open(text, "r") as f:
+        return CorpusIndex.from_text(f.read())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the KWIC index of a keyword.")
+    parser.add_argument("text", help="file name under data/ or path to a text file")
+    parser.add_argument(
+        "keyword", help="keyword or phrase to search for; words may use * ? or /regex/"
+    )
+    parser.add_argument("--format", choices=list(FORMATS), default="txt")
+    parser.add_argument("--width", type=int, default=100)
+    parser.add_argument("--sort", choices=SORT_KEYS, help="sort the lines by context")
+    parser.add_argument(
+        "--case-sensitive", action="store_true", help="match the case of the keyword"
+    )
+    parser.add_argument("--output", type=Path, help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    corpus = open_corpus(args.text)
+    phrase = parse_query(args.keyword, args.case_sensitive)
+    try:
+        validate_query(phrase)
+    except ValueError as err:
+        parser.error(str(err))
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        chunks = export_kwic(
+            corpus, phrase, args.format, args.width, args.sort, args.case_sensitive
+        )
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Timing spans, counters and sizes recorded while serving a page
+
+Instrumented code calls ``span``, ``count`` and ``record`` unconditionally.
+They only record something inside a ``trace``; otherwise they return at once,
+so the instrumentation costs next to nothing while profiling is off. Each
+finished trace is written to the ``concordance.profile`` logger as one JSON line.
+"""
+# Import libraries
+import contextvars
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+# Define constants
+# set CONCORDANCE_PROFILE=1 to trace every page run, not only the ones with the debug panel open
+ENABLED = os.environ.get("CONCORDANCE_PROFILE", "") not in ("", "0")
+LOGGER_NAME = "concordance.profile"
+
+_current = contextvars.ContextVar("profile_trace", default=None)
+_null_span = nullcontext()
+
+
+class Trace:
+    """the spans, counters and sizes recorded during one traced run"""
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration = None
+        # (name, nesting depth, start offset, duration) in seconds, in start order
+        self.spans = []
+        self.counters = {}
+        self.sizes = {}
+        self._depth = 0
+
+    def to_dict(self):
+        return {
+            "trace": self.name,
+            "duration_ms": round(self.duration * 1000, 3),
+            "spans": [
+                {
+                    "name": name,
+                    "depth": depth,
+                    "start_ms": round(start * 1000, 3),
+                    "duration_ms": round(duration * 1000, 3),
+                }
+                for name, depth, start, duration in self.spans
+            ],
+            "counters": self.counters,
+            "sizes": self.sizes,
+        }
+
+
+class _Span:
+    __slots__ = ("trace", "name", "index", "start")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        trace = self.trace
+        self.start = time.perf_counter()
+        self.index = len(trace.spans)
+        trace.spans.append((self.name, trace._depth, self.start - trace.start, None))
+        trace._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        trace = self.trace
+        trace._depth -= 1
+        name, depth, start, _ = trace.spans[self.index]
+        trace.spans[self.index] = (name, depth, start, time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    """a context manager timing a stage of the current trace"""
+    trace = _current.get()
+    if trace is None:
+        return _null_span
+    return _Span(trace, name)
+
+
+def count(name, n=1):
+    """add to a counter of the current trace, like cache hits or rendered bytes"""
+    trace = _current.get()
+    if trace is not None:
+        trace.counters[name] = trace.counters.get(name, 0) + n
+
+
+def record(name, value):
+    """record a size of the current trace, like the number of tokens or hits"""
+    trace = _current.get()
+    if trace is not None:
+        trace.sizes[name] = value
+
+
+def _logger():
+    logger = logging.getLogger(LOGGER_NAME)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+@contextmanager
+def trace(name, enabled=ENABLED):
+    """
+    Record the spans, counters and sizes of the code run inside the block and
+    log them as one JSON line when it ends. Yields the ``Trace``, or None when
+    not enabled.
+    """
+    if not enabled:
+        yield None
+        return
+    current = Trace(name)
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+        current.duration = time.perf_counter() - current.start
+        _logger().info(json.dumps(current.to_dict()))
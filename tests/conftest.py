@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Shared fixtures: the app's modules live at the top of the repository
+"""
+# Import libraries
+import sys
+from pathlib import Path
+
+import pytest
+
+# Define constants
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+from corpus_index import DATA_DIR, CorpusIndex  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def othello_text():
+    with open(DATA_DIR / "othello.txt", "r") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="session")
+def othello(othello_text):
+    """Othello indexed in memory, so the tests never write indexes under data/"""
+    return CorpusIndex.from_text(othello_text)
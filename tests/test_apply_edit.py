@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Incremental re-indexing of an edited text against a full rebuild
+"""
+# Import libraries
+import random
+
+import numpy as np
+import pytest
+
+from corpus_index import CorpusIndex
+
+# Define constants
+SEED = 426
+EDITS = 40
+INSERTS = (
+    "love",
+    " Othello ",
+    "handkerchief",
+    "\n\n",
+    ". ",
+    "O, ",
+    "zzyzx",
+    "Cassio's",
+    "—",
+)
+
+
+def assert_same_index(edited, rebuilt):
+    assert edited.vocab.tolist() == rebuilt.vocab.tolist()
+    assert edited.ids.dtype == rebuilt.ids.dtype
+    for name in ("ids", "offsets", "positions", "spans"):
+        assert np.array_equal(getattr(edited, name), getattr(rebuilt, name)), name
+    assert edited.text == rebuilt.text
+
+
+def random_edit(rng, text):
+    """insert, delete, replace or move a stretch of the text"""
+    start = rng.randrange(len(text) + 1)
+    end = min(len(text), start + rng.choice((0, 1, 5, 40, 300)))
+    kind = rng.choice(("insert", "delete", "replace", "paste"))
+    if kind == "insert":
+        return text[:start] + rng.choice(INSERTS) + text[start:]
+    if kind == "delete":
+        return text[:start] + text[end:]
+    if kind == "replace":
+        return text[:start] + rng.choice(INSERTS) + text[end:]
+    source = rng.randrange(len(text))
+    return text[:start] + text[source : source + 200] + text[end:]
+
+
+@pytest.fixture(scope="module")
+def opening(othello_text):
+    return othello_text[:30000]
+
+
+def test_random_edits_match_rebuild(opening):
+    rng = random.Random(SEED)
+    text = opening
+    index = CorpusIndex.from_text(text)
+    for _ in range(EDITS):
+        text = random_edit(rng, text)
+        index = index.apply_edit(text)
+        assert_same_index(index, CorpusIndex.from_text(text))
+
+
+@pytest.mark.parametrize(
+    "edit",
+    [
+        lambda text: "",
+        lambda text: "zzyzx " + text,
+        lambda text: text + " more",
+        lambda text: text[: len(text) // 2],
+        lambda text: text.replace("Iago", "Jago"),
+    ],
+)
+def test_edges_match_rebuild(opening, edit):
+    text = edit(opening)
+    assert_same_index(
+        CorpusIndex.from_text(opening).apply_edit(text), CorpusIndex.from_text(text)
+    )
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Case-insensitive and case-sensitive counts against the words as written in the text
+"""
+# Import libraries
+import re
+
+import numpy as np
+import pytest
+
+from corpus_index import is_regex, parse_query
+
+
+def brute_force_count(corpus, word, case_sensitive):
+    forms = corpus.surface_forms(np.arange(len(corpus)))
+    if is_regex(word):
+        regex = re.compile(word[1:-1], 0 if case_sensitive else re.IGNORECASE)
+    else:
+        regex = re.compile(
+            "".join(
+                ".*" if c == "*" else "." if c == "?" else re.escape(c) for c in word
+            ),
+            0 if case_sensitive else re.IGNORECASE,
+        )
+    return sum(1 for form in forms if regex.fullmatch(form))
+
+
+@pytest.mark.parametrize(
+    "word", ["Iago", "iago", "IAGO", "Iag*", "/Iago/", "/i.go/", "Love", "O"]
+)
+@pytest.mark.parametrize("case_sensitive", [False, True])
+def test_counts_match_brute_force(othello, word, case_sensitive):
+    phrase = parse_query(word, case_sensitive)
+    expected = brute_force_count(othello, word, case_sensitive)
+    assert othello.count(phrase, case_sensitive) == expected
+    assert othello.count_many([phrase], case_sensitive).tolist() == [expected]
+
+
+def test_case_sensitive_hits_are_a_subset(othello):
+    for word in ["Iago", "/Iago/", "Iag*", "/[A-Z]+/"]:
+        everywhere = set(othello.find(parse_query(word)).tolist())
+        exact = set(othello.find(parse_query(word, True), True).tolist())
+        assert exact and exact < everywhere
+
+
+def test_lines_keep_the_original_case(othello):
+    lines = othello.concordance_list(["iago"], width=100, lines=10**6)
+    assert {line.query for line in lines} >= {"Iago", "IAGO"}
+    assert all(line.query.lower() == "iago" for line in lines)
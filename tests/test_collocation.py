@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Collocation window counts and the collocations query
+"""
+# Import libraries
+import numpy as np
+import pytest
+
+import concordance_api as api
+from collocation import window_counts
+
+
+def test_window_counts_exclude_the_node(othello):
+    counts = window_counts(othello, ["my", "lord"], window=3)
+    assert counts.node_freq == othello.count(["my", "lord"])
+    assert np.all(counts.observed <= counts.corpus_freq)
+    # overlapping windows count each token once
+    assert counts.slots <= counts.node_freq * 6
+
+
+@pytest.mark.parametrize(
+    "options", [{"window": 0}, {"window": -3}, {"top_k": 0}, {"top_k": -1}]
+)
+def test_collocations_reject_bad_sizes(options):
+    with pytest.raises(ValueError):
+        api.collocations("love", **options)
+
+
+def test_collocations_of_an_indexed_text(othello_text):
+    corpus_id = api.index_text(othello_text)["corpus"]
+    found = api.collocations("lord", [corpus_id], window=3, top_k=5)["collocates"]
+    assert len(found) == 5
+    assert all(collocate["word"] != "lord" for collocate in found)
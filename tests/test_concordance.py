@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Concordance lines from the positional index against nltk.Text
+"""
+# Import libraries
+import numpy as np
+import pytest
+
+# Define constants
+WORDS = ("black", "love", "iago", "handkerchief", "o", ",", "zzzz")
+PHRASES = ("my lord", "the moor", "i do beseech you", "not a word")
+
+
+def lines_as_tuples(lines):
+    return [
+        (line.offset, list(line.left), line.query.lower(), list(line.right))
+        for line in lines
+    ]
+
+
+@pytest.fixture(scope="module")
+def nltk_text(othello):
+    nltk = pytest.importorskip("nltk")
+    return nltk.Text(othello.surface_forms(np.arange(len(othello))))
+
+
+@pytest.mark.parametrize("query", WORDS + PHRASES)
+def test_concordance_matches_nltk(othello, nltk_text, query):
+    expected = nltk_text.concordance_list(query.split(), width=100, lines=10**6)
+    found = othello.concordance_list(query.split(), width=100, lines=10**6)
+    assert lines_as_tuples(found) == lines_as_tuples(expected)
+
+
+def test_lines_are_limited(othello, nltk_text):
+    found = othello.concordance_list(["the"], width=100, lines=25)
+    assert lines_as_tuples(found) == lines_as_tuples(
+        nltk_text.concordance_list("the", width=100, lines=25)
+    )
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Dispersion measures on hand-computed cases and the act divisions of a play
+"""
+# Import libraries
+import math
+
+import numpy as np
+
+from corpus_index import CorpusIndex
+from dispersion import act_starts, dispersion, downsample, dp, equal_parts, juilland_d
+
+# Define constants
+SIZES = [10, 10, 10, 10]
+
+
+def test_even_spread():
+    assert juilland_d([2, 2, 2, 2], SIZES) == 1
+    assert dp([2, 2, 2, 2], SIZES) == 0
+    # in proportion to unequal parts
+    assert math.isclose(juilland_d([1, 2, 3], [10, 20, 30]), 1)
+    assert math.isclose(dp([1, 2, 3], [10, 20, 30]), 0, abs_tol=1e-12)
+
+
+def test_all_hits_in_one_part():
+    assert juilland_d([0, 0, 5, 0], SIZES) == 0
+    assert dp([0, 0, 5, 0], SIZES) == 0.75
+    assert dp([0, 0, 5, 0], SIZES, normalize=True) == 1
+
+
+def test_no_hits_is_nan():
+    with np.errstate(all="raise"):
+        assert math.isnan(juilland_d([0, 0, 0, 0], SIZES))
+        assert math.isnan(dp([0, 0, 0, 0], SIZES))
+        assert math.isnan(dp([0, 0, 0, 0], SIZES, normalize=True))
+
+
+def test_measures_along_the_last_axis():
+    counts = np.array([[2, 2, 2, 2], [0, 0, 5, 0]])
+    assert juilland_d(counts, SIZES).tolist() == [1, 0]
+    assert dp(counts, SIZES, normalize=True).tolist() == [0, 1]
+
+
+def test_othello_has_five_acts(othello):
+    assert len(act_starts(othello)) == 5
+    spread = dispersion(othello, ["iago"])
+    assert spread.acts and len(spread.counts) == 5
+    assert spread.boundaries[0] == 0
+    assert spread.counts.sum() == othello.count(["iago"])
+    assert 0 < spread.juilland_d <= 1 and 0 <= spread.dp_norm <= 1
+
+
+def test_equal_parts():
+    assert equal_parts(100, 4).tolist() == [0, 25, 50, 75]
+    assert equal_parts(3, 10).tolist() == [0, 1, 2]
+    corpus = CorpusIndex.from_text("Love me, love my dog. " * 50)
+    spread = dispersion(corpus, ["love"], parts=4)
+    assert not spread.acts and len(spread.counts) == 4
+    assert spread.counts.tolist() == [25, 25, 25, 25]
+    # the parts differ by a token, so the spread is only nearly even
+    assert math.isclose(spread.juilland_d, 1, abs_tol=0.01)
+    assert math.isclose(spread.dp, 0, abs_tol=0.01)
+
+
+def test_downsample_keeps_at_most_resolution_marks():
+    relative = np.sort(np.random.default_rng(0).random(10_000))
+    kept = downsample(relative, resolution=100)
+    assert len(kept) <= 100 and kept[0] == relative[0]
+    assert len(np.unique((kept * 100).astype(int))) == len(kept)
+    # marks in different slices are all kept
+    sparse = np.array([0.0, 0.25, 0.5, 0.999])
+    assert downsample(sparse, resolution=100).tolist() == sparse.tolist()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Saving, memory mapping and concurrently building the on-disk indexes
+"""
+# Import libraries
+import json
+import random
+import threading
+
+import numpy as np
+
+from corpus_index import CorpusIndex, MappedText, load_index
+from tokenization import sentence_splitter
+
+# Define constants
+WIDE_TEXT = "Café — naïve “quotes” and 🎭 masks.\n\nÜber café, cafe, CAFÉ! " * 40
+
+
+def test_save_and_load_round_trip(othello, tmp_path):
+    othello.save(tmp_path / "othello.index")
+    loaded = CorpusIndex.load(tmp_path / "othello.index")
+    assert loaded.vocab.tolist() == othello.vocab.tolist()
+    for name in ("ids", "offsets", "positions", "spans"):
+        assert np.array_equal(getattr(loaded, name), getattr(othello, name))
+    assert str(loaded.text) == othello.text
+    assert loaded.count(["iago"]) == othello.count(["iago"])
+
+
+def test_mapped_text_slices_like_a_string(tmp_path):
+    corpus = CorpusIndex.from_text(WIDE_TEXT)
+    corpus.save(tmp_path / "wide.index")
+    loaded = CorpusIndex.load(tmp_path / "wide.index")
+    assert isinstance(loaded.text, MappedText)
+    assert len(loaded.text) == len(WIDE_TEXT)
+    rng = random.Random(0)
+    for _ in range(200):
+        start, stop = sorted(rng.randrange(len(WIDE_TEXT) + 1) for _ in range(2))
+        assert loaded.text[start:stop] == WIDE_TEXT[start:stop]
+        assert loaded.text[start - 1] == WIDE_TEXT[start - 1]
+    positions = np.arange(len(corpus))
+    assert loaded.surface_forms(positions) == corpus.surface_forms(positions)
+    assert loaded.concordance_list(["café"], width=60) == corpus.concordance_list(
+        ["café"], width=60
+    )
+
+
+def test_concurrent_load_index_builds_cleanly(tmp_path, othello_text):
+    (tmp_path / "othello.txt").write_text(othello_text)
+    errors = []
+
+    def load():
+        try:
+            assert len(load_index("othello.txt", tmp_path)) > 0
+        except Exception as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=load) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "othello.index",
+        "othello.txt",
+    ]
+
+
+def test_index_is_rebuilt_when_the_splitter_changes(tmp_path, othello_text):
+    (tmp_path / "othello.txt").write_text(othello_text[:5000])
+    load_index("othello.txt", tmp_path)
+    meta_path = tmp_path / "othello.index" / "meta.json"
+    meta = json.loads(meta_path.read_text())
+    assert meta["splitter"] == sentence_splitter()
+    meta_path.write_text(json.dumps({**meta, "splitter": "another"}))
+    load_index("othello.txt", tmp_path)
+    assert json.loads(meta_path.read_text())["splitter"] == sentence_splitter()
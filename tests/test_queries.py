@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Wildcard and regular-expression query words against a brute-force scan of the vocabulary
+"""
+# Import libraries
+import re
+
+import pytest
+
+from corpus_index import CorpusIndex, is_regex, parse_query, validate_query
+
+# Define constants
+# patterns with a literal prefix, a suffix, an infix, none, and alternation
+PATTERNS = (
+    "lov*",
+    "*ness",
+    "*ove*",
+    "?o?e",
+    "[ab]*",
+    "/love|hate/",
+    "/hate|love/",
+    "/a|b/",
+    "/(lo|ha)[vt]e/",
+    "/Love/",
+    "/.*ing/",
+    "/[^a-z]+/",
+)
+
+
+def brute_force_expand(corpus, word):
+    """the vocabulary ids whose word fully matches a query word, checked one by one"""
+    if is_regex(word):
+        regex = re.compile(word[1:-1], re.IGNORECASE)
+    else:
+        regex = re.compile(
+            "".join(
+                ".*" if c == "*" else "." if c == "?" else re.escape(c)
+                for c in word.lower()
+            )
+        )
+    return [i for i, w in enumerate(corpus.vocab.tolist()) if regex.fullmatch(w)]
+
+
+@pytest.mark.parametrize("word", PATTERNS)
+def test_expand_matches_brute_force(othello, word):
+    validate_query([word])
+    assert othello.expand(word).tolist() == brute_force_expand(othello, word)
+
+
+def test_regex_alternatives_find_every_hit(othello):
+    love = othello.count(parse_query("love"))
+    hate = othello.count(parse_query("hate"))
+    assert othello.count(parse_query("/love|hate/")) == love + hate
+    assert othello.count(parse_query("/hate|love/")) == love + hate
+
+
+def test_invalid_regex_is_rejected():
+    with pytest.raises(ValueError):
+        validate_query(parse_query("/(/"))
+
+
+@pytest.mark.parametrize(
+    "word", ["*é", "*ve", "*ï*", "*x", "*xy*", "x*", "?a*", "/.*y.*/"]
+)
+def test_expand_long_and_multibyte_words(word):
+    words = ["café", "naïve", "über", "eve", "cave", "x" * 30000 + "y", "xy", "ab"]
+    corpus = CorpusIndex.from_tokens(words * 2)
+    assert len(corpus._suffix_table().long_ids) == 1
+    assert corpus.expand(word).tolist() == brute_force_expand(corpus, word)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Corpus discovery and the fan-out of queries over the registered corpora
+"""
+# Import libraries
+from functools import partial
+
+import numpy as np
+
+import corpus_registry
+from collocation import window_counts
+from corpus_index import CorpusIndex
+from corpus_registry import CorpusRegistry
+from dispersion import dispersion
+
+
+def test_fan_out_on_processes_matches_inline(tmp_path, othello_text, monkeypatch):
+    for k in range(3):
+        (tmp_path / f"part_{k}.txt").write_text(
+            othello_text[k * 40000 : (k + 1) * 40000]
+        )
+    registry = CorpusRegistry(tmp_path, max_workers=2)
+    assert [info.corpus_id for info in registry] == [f"part_{k}.txt" for k in range(3)]
+    queries = [
+        partial(CorpusIndex.count, phrase=["my", "lord"]),
+        partial(window_counts, phrase=["love"], window=3),
+        partial(dispersion, phrase=["iago"]),
+    ]
+    inline = [registry.fan_out(query) for query in queries]
+    monkeypatch.setattr(corpus_registry, "PARALLEL_MIN_TOKENS", 0)
+    parallel = [registry.fan_out(query) for query in queries]
+    assert list(parallel[0].items()) == list(inline[0].items())
+    for cid, counts in inline[1].items():
+        assert parallel[1][cid].vocab.tolist() == counts.vocab.tolist()
+        assert np.array_equal(parallel[1][cid].observed, counts.observed)
+    for cid, spread in inline[2].items():
+        assert np.array_equal(parallel[2][cid].counts, spread.counts)
+        assert parallel[2][cid].dp == spread.dp
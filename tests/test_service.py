@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Request checking and error statuses of the concordance service
+"""
+# Import libraries
+from http import HTTPStatus
+
+import pytest
+
+import concordance_service
+from concordance_service import RequestError, dispatch
+
+
+@pytest.fixture(scope="module")
+def text_id(othello_text):
+    return dispatch("POST", "/texts", {"text": othello_text})["corpus"]
+
+
+def status_of(method, path, body):
+    with pytest.raises(RequestError) as err:
+        dispatch(method, path, body)
+    return err.value.status, str(err.value)
+
+
+@pytest.mark.parametrize(
+    "field, value",
+    [
+        ("corpus", 1),
+        ("query", ["love"]),
+        ("page", "1"),
+        ("page", True),
+        ("page_size", 2.5),
+        ("case_sensitive", 1),
+        ("sort", 3),
+    ],
+)
+def test_wrong_field_types_are_bad_requests(text_id, field, value):
+    body = {"corpus": text_id, "query": "love", field: value}
+    status, message = status_of("POST", "/concordance", body)
+    assert status == HTTPStatus.BAD_REQUEST
+    assert repr(field) in message
+
+
+@pytest.mark.parametrize("value", ["othello.txt", [1], None])
+def test_corpora_must_be_a_list_of_strings(value):
+    status, _ = status_of("POST", "/frequencies", {"query": "love", "corpora": value})
+    assert status == HTTPStatus.BAD_REQUEST
+
+
+def test_missing_field(text_id):
+    status, message = status_of("POST", "/concordance", {"corpus": text_id})
+    assert status == HTTPStatus.BAD_REQUEST and "'query'" in message
+
+
+@pytest.mark.parametrize(
+    "path, body",
+    [
+        ("/concordance", {"query": "love", "sort": "L9"}),
+        ("/concordance", {"query": "love", "page": -1}),
+        ("/export", {"query": "love", "format": "docx"}),
+        ("/concordance", {"query": "/(/"}),
+        ("/concordance", {"query": "   "}),
+        ("/collocations", {"query": "love", "window": 0}),
+    ],
+)
+def test_invalid_values_are_bad_requests(text_id, path, body):
+    status, _ = status_of(
+        "POST", path, {"corpus": text_id, "corpora": [text_id], **body}
+    )
+    assert status == HTTPStatus.BAD_REQUEST
+
+
+def test_unknown_corpus_and_path_are_not_found():
+    status, message = status_of(
+        "POST", "/concordance", {"corpus": "nope", "query": "a"}
+    )
+    assert status == HTTPStatus.NOT_FOUND and "nope" in message
+    assert status_of("GET", "/nowhere", {})[0] == HTTPStatus.NOT_FOUND
+
+
+def test_valid_requests(text_id):
+    page = dispatch("POST", "/concordance", {"corpus": text_id, "query": "iago"})
+    assert page["total"] > 0
+    counts = dispatch("POST", "/frequencies", {"query": "iago", "corpora": [text_id]})
+    assert counts[0]["count"] == page["total"]
+
+
+def test_programming_errors_are_not_client_errors(monkeypatch):
+    def broken(body):
+        raise TypeError("a bug")
+
+    monkeypatch.setitem(concordance_service.ROUTES, ("GET", "/health"), broken)
+    with pytest.raises(TypeError):
+        dispatch("GET", "/health", {})
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Sorted concordance orders against a brute-force sort of the hits by context
+"""
+# Import libraries
+import pytest
+
+from corpus_index import SORT_KEYS, parse_query
+
+
+def brute_force_order(corpus, starts, phrase_len, sort):
+    """sort hits by the context tokens at the sort offsets, missing context first, ties in document order"""
+    offsets = corpus._sort_offsets(phrase_len, sort)
+    tokens = corpus.vocab.words(corpus.ids)
+
+    def key(start):
+        context = []
+        for offset in offsets:
+            position = start + offset
+            inside = 0 <= position < len(tokens)
+            context.append((inside, tokens[position] if inside else ""))
+        return context
+
+    return sorted(starts.tolist(), key=key)
+
+
+@pytest.mark.parametrize("sort", SORT_KEYS)
+@pytest.mark.parametrize("query", ["love", "my lord", "o*"])
+def test_sorted_hits_match_brute_force(othello, query, sort):
+    phrase = parse_query(query)
+    starts = othello.find(phrase)
+    expected = brute_force_order(othello, starts, len(phrase), sort)
+    assert othello.sorted_hits(phrase, sort).tolist() == expected
+    # the first page is found by partial selection rather than a full sort
+    othello._sort_cache.clear()
+    assert othello.sorted_hits(phrase, sort, stop=7).tolist() == expected[:7]
+    # later pages come from the cached full order
+    lines, total = othello.concordance_page(phrase, page=1, page_size=7, sort=sort)
+    assert [line.offset for line in lines] == expected[7:14]
+    assert total == len(expected)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+The corpus store's memory budget, eviction order and single builds
+"""
+# Import libraries
+import threading
+import time
+from collections import namedtuple
+
+from corpus_store import CorpusStore, fingerprint
+
+# Define constants
+Sized = namedtuple("Sized", ["name", "nbytes"])
+
+
+def stored(store):
+    return list(store._entries)
+
+
+def test_least_recently_used_is_evicted_first():
+    store = CorpusStore(max_bytes=30)
+    for name in "abc":
+        store.put(name, Sized(name, 10))
+    store.get("a")
+    store.put("d", Sized("d", 10))
+    assert stored(store) == ["c", "a", "d"]
+    assert store.get("b") is None
+    assert store.stats()["evictions"] == 1 and store.stats()["bytes"] == 30
+
+
+def test_pinned_entries_are_never_evicted():
+    store = CorpusStore(max_bytes=30)
+    store.put("work", Sized("work", 25), pinned=True)
+    store.put("text", Sized("text", 10))
+    store.put("other", Sized("other", 10))
+    assert stored(store) == ["work", "other"]
+    store.put("more", Sized("more", 1))
+    assert "work" in stored(store)
+
+
+def test_the_entry_just_put_is_kept_over_budget():
+    store = CorpusStore(max_bytes=30)
+    store.put("small", Sized("small", 10))
+    big = store.put("big", Sized("big", 50))
+    assert big.name == "big" and stored(store) == ["big"]
+    store.put("next", Sized("next", 10))
+    assert stored(store) == ["next"]
+
+
+def test_put_returns_the_existing_entry():
+    store = CorpusStore()
+    first = store.put("k", Sized("first", 1))
+    assert store.put("k", Sized("second", 1)) is first
+
+
+def test_concurrent_misses_build_once():
+    store = CorpusStore()
+    builds = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.05)
+        return Sized("built", 1)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(store.get_or_build("k", build)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert len(results) == 8 and all(result is results[0] for result in results)
+
+
+def test_fingerprint_depends_on_the_content():
+    assert fingerprint("love") == fingerprint("love")
+    assert fingerprint("love") != fingerprint("Love")
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Parallel tokenization against tokenizing the whole text at once
+"""
+# Import libraries
+import numpy as np
+import pytest
+
+import tokenization
+from tokenization import align_spans, tokenize_spans, word_tokenize
+
+
+@pytest.mark.parametrize("chunk_chars", [2_000, 25_000])
+def test_parallel_tokenization_matches_serial(monkeypatch, othello_text, chunk_chars):
+    monkeypatch.setattr(tokenization, "PARALLEL_MIN_CHARS", 0)
+    chunks = list(
+        tokenization._chunk_sentences(
+            othello_text, tokenization._split_sentences(othello_text), chunk_chars
+        )
+    )
+    assert len(chunks) > 1
+    done = []
+    tokens, spans = tokenize_spans(othello_text, done.append, chunk_chars=chunk_chars)
+    expected = word_tokenize(othello_text)
+    assert tokens == expected
+    assert np.array_equal(spans, align_spans(othello_text, expected))
+    assert done[-1] == 1.0 and done == sorted(done)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+"""
+Tokenization of texts into tokens and character spans
+"""
+# Import libraries
+import multiprocessing
+import os
+import re
+import threading
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+# Define constants
+# tokenizer models fetched by build_corpus.py --fetch-nltk, so startup never
+# has to download them
+NLTK_DATA_DIR = Path(__file__).parent / "nltk_data"
+NLTK_RESOURCES = (
+    "punkt",
+    "punkt_tab",
+    "averaged_perceptron_tagger",
+    "averaged_perceptron_tagger_eng",
+)
+QUOTE_TOKENS = ("``", "''")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# the sentence splitters, recorded with each saved index: the punkt model, or
+# the fallback splitting after sentence-final punctuation
+PUNKT = "punkt"
+REGEX_SPLITTER = "regex"
+# texts shorter than this are tokenized on the calling thread
+PARALLEL_MIN_CHARS = 200_000
+CHUNK_CHARS = 100_000
+# text on each side of an edit that is split into sentences to find where the
+# edited part can be re-tokenized from
+EDIT_CONTEXT_CHARS = 2_000
+
+_sentence_splitter = None
+_splitter_name = None
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def fetch_nltk_data():
+    """download the tokenizer and tagger models into the vendored nltk_data/ directory"""
+    import nltk
+
+    for resource in NLTK_RESOURCES:
+        nltk.download(resource, download_dir=str(NLTK_DATA_DIR), quiet=True)
+
+
+def use_vendored_nltk_data():
+    """make nltk look for its models in the vendored nltk_data/ directory first"""
+    import nltk
+
+    if str(NLTK_DATA_DIR) not in nltk.data.path:
+        nltk.data.path.insert(0, str(NLTK_DATA_DIR))
+
+
+def sentence_splitter():
+    """
+    Return the name of the sentence splitter texts are tokenized with:
+    ``PUNKT`` when the punkt model is installed, else ``REGEX_SPLITTER``,
+    which splits after sentence-final punctuation and so tokenizes some
+    texts differently from ``nltk.word_tokenize``.
+    """
+    global _sentence_splitter, _splitter_name
+    import nltk
+
+    if _sentence_splitter is None:
+        use_vendored_nltk_data()
+        try:
+            nltk.sent_tokenize("")
+            _sentence_splitter, _splitter_name = nltk.sent_tokenize, PUNKT
+        except LookupError:
+            warnings.warn(
+                "the punkt sentence model is not installed, so texts are split "
+                "into sentences at sentence-final punctuation and tokenized "
+                "differently from nltk.word_tokenize; run "
+                "`python build_corpus.py --fetch-nltk` to fetch it",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+            _sentence_splitter, _splitter_name = SENTENCE_END.split, REGEX_SPLITTER
+    return _splitter_name
+
+
+def _split_sentences(data_string):
+    """split a text into sentences with the splitter ``sentence_splitter`` names"""
+    sentence_splitter()
+    return _sentence_splitter(data_string)
+
+
+def _tokenize_sentences(sentences):
+    from nltk.tokenize import NLTKWordTokenizer
+
+    tokenizer = NLTKWordTokenizer()
+    return [token for sentence in sentences for token in tokenizer.tokenize(sentence)]
+
+
+def word_tokenize(data_string):
+    """tokenize a text like ``nltk.word_tokenize``, without ever downloading a model"""
+    return _tokenize_sentences(_split_sentences(data_string))
+
+
+def align_spans(data_string, tokens):
+    """
+    Return an (n, 2) array of the [start, end) character offsets of each token
+    in the text it was tokenized from.
+    """
+    spans = np.empty((len(tokens), 2), dtype=np.int32)
+    cursor = 0
+    for i, token in enumerate(tokens):
+        start = data_string.find(token, cursor)
+        end = start + len(token)
+        if token in QUOTE_TOKENS:
+            # word_tokenize rewrites straight double quotes as `` and ''
+            quote = data_string.find('"', cursor)
+            if quote != -1 and (start == -1 or quote < start):
+                start, end = quote, quote + 1
+        if start == -1:
+            start = end = cursor
+        spans[i] = start, end
+        cursor = end
+    return spans
+
+
+def _tokenize_chunk(chunk, sentences, chunk_start):
+    """tokenize the sentences of one chunk and align them to the whole text"""
+    tokens = _tokenize_sentences(sentences)
+    spans = align_spans(chunk, tokens)
+    spans += chunk_start
+    return tokens, spans
+
+
+def _chunk_sentences(data_string, sentences, chunk_chars):
+    """
+    Group consecutive sentences into chunks of about ``chunk_chars`` characters.
+    Yields (chunk text, its sentences, offset of the chunk in the text).
+    """
+    chunk_start = cursor = 0
+    chunk = []
+    for sentence in sentences:
+        # the sentence splitters return slices of the text, so this finds each in order
+        start = data_string.find(sentence, cursor)
+        if chunk and start - chunk_start >= chunk_chars:
+            yield data_string[chunk_start:cursor], chunk, chunk_start
+            chunk_start, chunk = start, []
+        chunk.append(sentence)
+        cursor = start + len(sentence)
+    if chunk:
+        yield data_string[chunk_start:cursor], chunk, chunk_start
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # the app and the service run threads, which forking would copy
+            # mid-flight into the workers, so they are started from a clean
+            # forkserver process instead
+            _pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count(),
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+    return _pool
+
+
+def tokenize_spans(data_string, progress=None, chunk_chars=CHUNK_CHARS):
+    """
+    Tokenize a text in its original case, returning its tokens and their
+    character spans.
+
+    Large texts are split between sentences into chunks that are tokenized on a
+    process pool and stitched back together in order, which gives exactly the
+    tokens of ``word_tokenize``. ``progress`` is called with the fraction of the
+    text done so far.
+    """
+    if len(data_string) < PARALLEL_MIN_CHARS:
+        tokens = word_tokenize(data_string)
+        spans = align_spans(data_string, tokens)
+        if progress is not None:
+            progress(1.0)
+        return tokens, spans
+
+    chunks = list(
+        _chunk_sentences(data_string, _split_sentences(data_string), chunk_chars)
+    )
+    pool = _get_pool()
+    futures = {
+        pool.submit(_tokenize_chunk, *chunk): i for i, chunk in enumerate(chunks)
+    }
+    results = [None] * len(chunks)
+    done_chars = 0
+    for future in as_completed(futures):
+        i = futures[future]
+        results[i] = future.result()
+        done_chars += len(chunks[i][0])
+        if progress is not None:
+            progress(min(done_chars / len(data_string), 1.0))
+    if progress is not None:
+        progress(1.0)
+
+    tokens = [token for chunk_tokens, _ in results for token in chunk_tokens]
+    spans = np.concatenate(
+        [chunk_spans for _, chunk_spans in results] + [np.empty((0, 2), np.int32)]
+    )
+    return tokens, spans
+
+
+def _common_prefix_length(a, b, block=4096):
+    """length of the longest common prefix of two strings, compared block by block"""
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i : i + block] == b[i : i + block]:
+        i += block
+    i = min(i, limit)
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def _common_suffix_length(a, b, limit, block=4096):
+    """length of the longest common suffix of two strings, at most ``limit``"""
+    n = 0
+    while n < limit:
+        a_block = a[max(len(a) - n - block, 0) : len(a) - n]
+        if a_block != b[max(len(b) - n - block, 0) : len(b) - n]:
+            break
+        n += block
+    n = min(n, limit)
+    while n < limit and a[len(a) - n - 1] == b[len(b) - n - 1]:
+        n += 1
+    return n
+
+
+def _sentence_starts(data_string, start, end):
+    """offsets of the sentences the splitter finds in ``data_string[start:end]``"""
+    window = data_string[start:end]
+    starts = []
+    cursor = 0
+    for sentence in _split_sentences(window):
+        cursor = window.find(sentence, cursor)
+        starts.append(start + cursor)
+        cursor += len(sentence)
+    return starts
+
+
+def edit_region(old_string, new_string, context_chars=EDIT_CONTEXT_CHARS):
+    """
+    Find the part of a text that an edit touched, widened to sentence boundaries
+    so it can be re-tokenized on its own. Returns (start, old_end, new_end): the
+    text before ``start`` and from ``old_end`` (``new_end`` in the new text) on
+    is unchanged and tokenizes the same way.
+    """
+    prefix = _common_prefix_length(old_string, new_string)
+    suffix = _common_suffix_length(
+        old_string, new_string, min(len(old_string), len(new_string)) - prefix
+    )
+    changed_end = len(new_string) - suffix
+    while True:
+        window_start = max(prefix - context_chars, 0)
+        window_end = min(changed_end + context_chars, len(new_string))
+        starts = _sentence_starts(new_string, window_start, window_end)
+        # the first and last sentences of the window may be cut by its edges, so
+        # only the text's own ends or the boundaries between sentences inside it
+        # are safe; a boundary also needs the sentences on both sides unchanged
+        bounds = list(zip(starts, starts[1:] + [window_end]))
+        start = 0 if window_start == 0 else None
+        new_end = len(new_string) if window_end == len(new_string) else None
+        for i in range(1, len(bounds)):
+            if bounds[i][1] <= prefix:
+                start = bounds[i][0]
+        for i in range(len(bounds) - 2, 0, -1):
+            if bounds[i - 1][0] >= changed_end:
+                new_end = bounds[i][0]
+        if start is not None and new_end is not None:
+            return start, new_end + len(old_string) - len(new_string), new_end
+        context_chars *= 4